@@ -1,20 +1,35 @@
 # GUI.py
+import glob
 import tkinter as tk
 from tkinter import scrolledtext
 from tkinter import ttk
 from ttkthemes import ThemedTk
 from PIL import Image, ImageTk
-from lexical_analyzer import tokenize
-from syntax_analyzer import Parser
-from semantic_analyzer import SemanticAnalyzer
-from all_main import build_symbol_table
+from diagnostics import Diagnostics
+from lexical_analyzer import IncrementalLexer
+from syntax_analyzer import IncrementalParser
+from semantic_analyzer import IncrementalAnalyzer
 from code_generator import CodeGenerator
 from code_executor import AssemblyInterpreter
+from symbol_index import link_project
+
+# Each phase stops reporting once this many errors have been collected
+MAX_ERRORS = 100
+
+# The editor has no file of its own, so names it does not define are looked up in the .txt files
+# of the working directory, indexed here
+PROJECT_FILES = '*.txt'
+INDEX_PATH = '.symbols.db'
 
 class CodeAnalyzerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("A++ Compiler")
+        # Re-lexes only the lines edited since the last action
+        self.lexer = IncrementalLexer()
+        self.parser = IncrementalParser()
+        self.analyzer = IncrementalAnalyzer()
+        self.index = link_project(self.parser.symbols, glob.glob(PROJECT_FILES), INDEX_PATH)
         
         # Set the main frame with dark theme
         mainframe = ttk.Frame(self.root, padding="10 10 10 10")
@@ -84,6 +99,12 @@ class CodeAnalyzerApp:
         self.results_display.pack(fill=tk.BOTH, expand=True)
 
 
+    # Re-indexes the project files changed on disk since the last action, and has the analyzer
+    # check again the units that may have used their old symbols
+    def link_project(self):
+        if self.index.sync(glob.glob(PROJECT_FILES)):
+            self.analyzer.invalidate_external()
+
     def run_analysis(self):
         code = self.code_editor.get("1.0", tk.END).strip()
         if not code:
@@ -92,30 +113,25 @@ class CodeAnalyzerApp:
             self.results_display.insert(tk.END, "Error: Your Code editor is empty. Please enter some code.")
             return
 
-        tokens, errors = tokenize(code)
-        symbol_table, symbol_table_errors = build_symbol_table(tokens)
-        errors.extend(symbol_table_errors)
-
-        parser = Parser(tokens)
-        parser.parse()
-        errors.extend(parser.errors)
+        errors = Diagnostics(MAX_ERRORS)
+        tokens, _ = self.lexer.update(code, errors)
+        tree, _ = self.parser.update(tokens, errors, self.lexer.take_edit())
+        symbol_table = self.parser.symbols
 
-        semantic = SemanticAnalyzer(symbol_table, tokens)
-        semantic.analyze()
-        errors.extend(semantic.errors)
+        self.link_project()
+        self.analyzer.update(self.parser, errors)
 
         self.results_display.delete("1.0", tk.END)
         if errors:
-            errors = set(errors)
             self.results_display.config(foreground='red')
             for error in errors:
                 self.results_display.insert(tk.END, error + '\n')
         else:
             self.results_display.config(foreground='green')
-            code_generator = CodeGenerator(symbol_table, tokens)
+            code_generator = CodeGenerator(symbol_table, tokens, tree)
             assembly_code = code_generator.generate()
             interpreter = AssemblyInterpreter()
-            interpreter.execute(assembly_code)
+            interpreter.execute(assembly_code, code_generator.constants)
             code = interpreter.debug()
             code_str = "\n".join(f"{key}: {value}" for key, value in code.items())
             self.results_display.insert(tk.END, code_str)
@@ -126,17 +142,14 @@ class CodeAnalyzerApp:
 
     def show_assembly(self):
         code = self.code_editor.get("1.0", tk.END).strip()
-        tokens, errors = tokenize(code)
-        symbol_table, er = build_symbol_table(tokens)
-
-        parser = Parser(tokens)
-        parser.parse()
-        errors.extend(parser.errors)
-
-        semantic = SemanticAnalyzer(symbol_table, tokens)
-        semantic.analyze()
-        errors.extend(semantic.errors)
-        code_generator = CodeGenerator(symbol_table, tokens)
+        errors = Diagnostics(MAX_ERRORS)
+        tokens, _ = self.lexer.update(code, errors)
+        tree, _ = self.parser.update(tokens, errors, self.lexer.take_edit())
+        symbol_table = self.parser.symbols
+
+        self.link_project()
+        self.analyzer.update(self.parser, errors)
+        code_generator = CodeGenerator(symbol_table, tokens, tree)
         assembly_code = code_generator.generate()
 
         token_window = tk.Toplevel(self.root)
@@ -147,7 +160,7 @@ class CodeAnalyzerApp:
 
     def show_tokens(self):
         code = self.code_editor.get("1.0", tk.END).strip()
-        tokens, errors = tokenize(code)
+        tokens, _ = self.lexer.update(code)
 
         tokens_str = "\n".join([f"{token}" for token in tokens])
 
@@ -157,45 +170,37 @@ class CodeAnalyzerApp:
         token_text.pack(padx=10, pady=10)
         token_text.insert(tk.END, tokens_str)
 
-    def update_symbol_table(self, symbol_table, interpreter_variables):
-        for var_name, value in interpreter_variables.items():
-            if var_name in symbol_table:
-                symbol_table[var_name]['value'] = value
-        return symbol_table
-
     def show_symbol_table(self):
         code = self.code_editor.get("1.0", tk.END).strip()
-        tokens, errors = tokenize(code)
-        symbol_table, symbol_table_errors = build_symbol_table(tokens)
-        errors.extend(symbol_table_errors)
-
-        parser = Parser(tokens)
-        parser.parse()
-        errors.extend(parser.errors)
+        errors = Diagnostics(MAX_ERRORS)
+        tokens, _ = self.lexer.update(code, errors)
+        syntax_tree, _ = self.parser.update(tokens, errors, self.lexer.take_edit())
+        symbol_table = self.parser.symbols
 
-        semantic_analyzer = SemanticAnalyzer(symbol_table, tokens)
-        semantic_analyzer.analyze()
-        errors.extend(semantic_analyzer.errors)
+        self.link_project()
+        self.analyzer.update(self.parser, errors)
 
         if errors:
             for error in errors:
                 print(error)
         else:
-            code_generator = CodeGenerator(symbol_table, tokens)
+            code_generator = CodeGenerator(symbol_table, tokens, syntax_tree)
             assembly_code = code_generator.generate()
             interpreter = AssemblyInterpreter()
-            interpreter.execute(assembly_code)
-            symbol_table = self.update_symbol_table(symbol_table, interpreter.debug())
+            interpreter.execute(assembly_code, code_generator.constants)
+            values = interpreter.debug()
             symbol_table_window = tk.Toplevel(self.root)
             symbol_table_window.title("Symbol Table")
-            columns = ('Lexeme', 'Token Type', 'Data Type', 'Line Number', 'Value')
+            columns = ('Lexeme', 'Token Type', 'Data Type', 'Line Number', 'Scope Depth', 'Slot', 'Value')
             tree = ttk.Treeview(symbol_table_window, columns=columns, show='headings')
             for col in columns:
                 tree.heading(col, text=col)
                 tree.column(col, anchor='center', width=100)
 
-            for lexeme, info in symbol_table.items():
-                tree.insert('', tk.END, values=(lexeme, info['token_type'], info['data_type'], info['line_number'], info['value']))
+            # Each symbol with the value its interpreter variable ended with
+            for symbol in symbol_table:
+                value = values.get(symbol_table.variable_name(symbol))
+                tree.insert('', tk.END, values=(symbol.name, symbol.kind, symbol.data_type, symbol.line, symbol.depth, symbol.slot, value))
 
             tree.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
 
@@ -1,92 +1,53 @@
 #all_main.py
+import os
 import re
-from lexical_analyzer import tokenize
+from diagnostics import Diagnostics
+from lexical_analyzer import tokenize_file, tokenize_stream
 from syntax_analyzer import Parser
 from semantic_analyzer import SemanticAnalyzer
 from code_generator import CodeGenerator
+from symbol_index import link_project, sibling_files
 
-Errors = []
+# Shared diagnostics sink for every phase
+Errors = Diagnostics()
 
-# Function to build the symbol table
-def build_symbol_table(tokens):
-    symbol_table = {}
-    current_data_type = None
-    current_name = None
-    error = []
-    for token_type, lexeme, line_number, *data_type in tokens:
-        
-        current_data_type = data_type[0] if data_type else None
-        if token_type == 'VARIABLE':
-            current_name = lexeme
-            if current_data_type == None:
-                current_name = None
-                continue
-            symbol_table[current_name] = {
-                'token_type': 'VARIABLE',
-                'data_type': current_data_type,
-                'line_number': line_number,
-                'value': None  
-            }
-        elif token_type == 'LITERAL' or token_type == 'CONSTANT':
-            if current_name is None or current_name not in symbol_table:
-                continue
-            
-            if symbol_table[current_name]['token_type'] == 'VARIABLE':
-                symbol_table[current_name]['value'] = lexeme
-            current_name = None  # Reset current_name after assigning value
-        elif token_type == 'FUNCTION':
-            current_name = lexeme
-            if current_name in symbol_table:
-                continue
-            data_type = data_type[0] if data_type else None
-            if data_type != None:
-                symbol_table[current_name] = {
-                    'token_type': 'FUNCTION',
-                    'data_type': data_type,
-                    'line_number': line_number,
-                    'value': None  
-                }   
-
-    return symbol_table, error
-
-# Read code from a file
-def read_code_from_file(filename):
+# Lex and parse a file as a token stream, without holding the source or the token list in memory
+def parse_file_stream(filename, diagnostics=None):
+    errors = Diagnostics() if diagnostics is None else diagnostics
     with open(filename, 'r') as file:
-        code = file.read()
-    return code
-
-# Use a raw string or forward slashes for the file path
-# file_path = r'G:\University_Study\8th Semester\Compiler-construction\cc-project\Compiler-construction-\Last_day_a++\code_file.txt'
-file_path = r'G:\University_Study\8th Semester\Compiler-construction\cc-project\Compiler-construction-\Last_day_a++\code_file.txt'
-# Alternatively, you could use forward slashes:
-# file_path = 'G:/University_Study/8th Semester/Compiler-construction/Last_Day/Last_day_a++/code.txt'
-
-code = read_code_from_file(file_path)
-
-# Tokenize the code
-tokens, errors = tokenize(code)
-Errors.extend(errors)
-
-# Build the symbol table
-symbol_table, symbol_table_errors = build_symbol_table(tokens)
-Errors.extend(symbol_table_errors)
-
-# Parse the code
-parser = Parser(tokens)
-parser.parse()
-Errors.extend(parser.errors)
-
-# Analyze semantics
-semantic_analyzer = SemanticAnalyzer(symbol_table, tokens)
-semantic_analyzer.analyze()
-Errors.extend(semantic_analyzer.errors)
-
-if Errors:
-    for error in Errors:
-        print(error)
-else:
-    # Generate assembly code
-    code_generator = CodeGenerator(symbol_table, tokens)
-    assembly_code = code_generator.generate()
-    with open("output.asm", "w") as f:
-        f.write(assembly_code)
+        parser = Parser(tokenize_stream(file, errors), errors)
+        parser.parse()
+    return errors
+
+if __name__ == "__main__":
+    # Use a raw string or forward slashes for the file path
+    # file_path = r'G:\University_Study\8th Semester\Compiler-construction\cc-project\Compiler-construction-\Last_day_a++\code_file.txt'
+    file_path = r'G:\University_Study\8th Semester\Compiler-construction\cc-project\Compiler-construction-\Last_day_a++\code_file.txt'
+    # Alternatively, you could use forward slashes:
+    # file_path = 'G:/University_Study/8th Semester/Compiler-construction/Last_Day/Last_day_a++/code.txt'
+
+    # Tokenize the code straight from a memory map of the file
+    tokens, _ = tokenize_file(file_path, Errors)
+
+    # Parse the code, building the symbol table along the way
+    parser = Parser(tokens, Errors)
+    tree = parser.parse()
+    symbol_table = parser.symbols
+
+    # Resolve names defined in the other .txt files of the same directory
+    index_path = os.path.join(os.path.dirname(os.path.abspath(file_path)), '.symbols.db')
+    link_project(symbol_table, sibling_files(file_path), index_path)
+
+    # Analyze semantics
+    semantic_analyzer = SemanticAnalyzer(symbol_table, tokens, Errors, tree)
+    semantic_analyzer.analyze()
+
+    if Errors:
+        for error in Errors:
+            print(error)
+    else:
+        # Generate assembly code
+        code_generator = CodeGenerator(symbol_table, tokens, tree)
+        assembly_code = code_generator.generate()
+        with open("output.asm", "w") as f:
+            f.write(assembly_code)
@@ -0,0 +1,244 @@
+#ast_nodes.py
+from operator import attrgetter
+
+class Node:
+    __slots__ = ('line',)
+    # Attributes holding child nodes or lists of child nodes, in source order
+    fields = ()
+
+    def children(self):
+        for field in self.fields:
+            value = getattr(self, field)
+            if isinstance(value, list):
+                yield from value
+            elif value is not None:
+                yield value
+
+    # Every constructor takes the slots in order followed by line, so pickling only sends those
+    # values; trees coming back from worker processes stay cheap to transfer. Nodes naming a
+    # symbol take it last, after line.
+    def __init_subclass__(cls):
+        names = tuple(name for name in cls.__slots__ if name != 'symbol') + ('line',)
+        if 'symbol' in cls.__slots__:
+            names += ('symbol',)
+        getter = attrgetter(*names)
+        cls.state = staticmethod(getter if len(names) > 1 else lambda node: (getter(node),))
+
+    def __reduce__(self):
+        return type(self), self.state(self)
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__ if name != 'symbol')
+        return f"{type(self).__name__}({values})"
+
+
+class Program(Node):
+    __slots__ = ('body',)
+    fields = ('body',)
+
+    def __init__(self, body, line=None):
+        self.body = body
+        self.line = line
+
+
+class Block(Node):
+    __slots__ = ('body',)
+    fields = ('body',)
+
+    def __init__(self, body, line=None):
+        self.body = body
+        self.line = line
+
+
+class Declaration(Node):
+    __slots__ = ('data_type', 'name', 'value', 'symbol')
+    fields = ('value',)
+
+    def __init__(self, data_type, name, value, line=None, symbol=None):
+        self.data_type = data_type
+        self.name = name
+        self.value = value
+        self.line = line
+        self.symbol = symbol
+
+
+class Assignment(Node):
+    __slots__ = ('name', 'value', 'symbol')
+    fields = ('value',)
+
+    def __init__(self, name, value, line=None, symbol=None):
+        self.name = name
+        self.value = value
+        self.line = line
+        self.symbol = symbol
+
+
+class If(Node):
+    # alternatives holds the Otherwise and Then branches that follow the iff
+    __slots__ = ('condition', 'body', 'alternatives')
+    fields = ('condition', 'body', 'alternatives')
+
+    def __init__(self, condition, body, alternatives=None, line=None):
+        self.condition = condition
+        self.body = body
+        self.alternatives = alternatives if alternatives is not None else []
+        self.line = line
+
+
+class Otherwise(Node):
+    __slots__ = ('condition', 'body')
+    fields = ('condition', 'body')
+
+    def __init__(self, condition, body, line=None):
+        self.condition = condition
+        self.body = body
+        self.line = line
+
+
+class Then(Node):
+    __slots__ = ('body',)
+    fields = ('body',)
+
+    def __init__(self, body, line=None):
+        self.body = body
+        self.line = line
+
+
+class Repeat(Node):
+    __slots__ = ('init', 'condition', 'step', 'body')
+    fields = ('init', 'condition', 'step', 'body')
+
+    def __init__(self, init, condition, step, body, line=None):
+        self.init = init
+        self.condition = condition
+        self.step = step
+        self.body = body
+        self.line = line
+
+
+class Rotate(Node):
+    __slots__ = ('condition', 'body')
+    fields = ('condition', 'body')
+
+    def __init__(self, condition, body, line=None):
+        self.condition = condition
+        self.body = body
+        self.line = line
+
+
+class FunctionDef(Node):
+    # params are Declaration nodes without a value
+    __slots__ = ('return_type', 'name', 'params', 'body', 'symbol')
+    fields = ('params', 'body')
+
+    def __init__(self, return_type, name, params, body, line=None, symbol=None):
+        self.return_type = return_type
+        self.name = name
+        self.params = params
+        self.body = body
+        self.line = line
+        self.symbol = symbol
+
+
+class Call(Node):
+    __slots__ = ('name', 'args', 'symbol')
+    fields = ('args',)
+
+    def __init__(self, name, args, line=None, symbol=None):
+        self.name = name
+        self.args = args
+        self.line = line
+        self.symbol = symbol
+
+
+class Showout(Node):
+    __slots__ = ('args',)
+    fields = ('args',)
+
+    def __init__(self, args, line=None):
+        self.args = args
+        self.line = line
+
+
+class Getinput(Node):
+    __slots__ = ('args',)
+    fields = ('args',)
+
+    def __init__(self, args, line=None):
+        self.args = args
+        self.line = line
+
+
+class Resume(Node):
+    __slots__ = ()
+
+    def __init__(self, line=None):
+        self.line = line
+
+
+class Stop(Node):
+    __slots__ = ()
+
+    def __init__(self, line=None):
+        self.line = line
+
+
+class BinaryOp(Node):
+    __slots__ = ('operator', 'left', 'right')
+    fields = ('left', 'right')
+
+    def __init__(self, operator, left, right, line=None):
+        self.operator = operator
+        self.left = left
+        self.right = right
+        self.line = line
+
+
+class UnaryOp(Node):
+    __slots__ = ('operator', 'operand', 'postfix')
+    fields = ('operand',)
+
+    def __init__(self, operator, operand, postfix=False, line=None):
+        self.operator = operator
+        self.operand = operand
+        self.postfix = postfix
+        self.line = line
+
+
+class Variable(Node):
+    __slots__ = ('name', 'symbol')
+
+    def __init__(self, name, line=None, symbol=None):
+        self.name = name
+        self.line = line
+        self.symbol = symbol
+
+
+class Literal(Node):
+    # kind is the token type, LITERAL or CONSTANT; value is the lexeme, and data_type and
+    # constant are its A++ type and Python value as decoded by the lexer
+    __slots__ = ('value', 'kind', 'data_type', 'constant')
+
+    def __init__(self, value, kind, data_type, constant, line=None):
+        self.value = value
+        self.kind = kind
+        self.data_type = data_type
+        self.constant = constant
+        self.line = line
+
+
+# Dispatches visit(node) to visit_<ClassName>, falling back to visiting the children
+class NodeVisitor:
+    def visit(self, node):
+        return getattr(self, 'visit_' + type(node).__name__, self.generic_visit)(node)
+
+    # Walks subtrees without a visit_ method on an explicit stack, in the same order as recursing
+    def generic_visit(self, node):
+        pending = list(node.children())[::-1]
+        while pending:
+            child = pending.pop()
+            visitor = getattr(self, 'visit_' + type(child).__name__, None)
+            if visitor is None:
+                pending.extend(list(child.children())[::-1])
+            else:
+                visitor(child)
@@ -0,0 +1,36 @@
+#bench_incremental_parser.py
+import sys
+import time
+from bench_lexer import generate_source
+from lexical_analyzer import IncrementalLexer
+from syntax_analyzer import IncrementalParser, Parser
+
+def main(sizes):
+    print(f"{'lines':>8} {'full':>9} {'char lex':>9} {'char edit':>10} {'line lex':>9} {'line edit':>10}")
+    for line_count in sizes:
+        code = generate_source(line_count)
+        lexer = IncrementalLexer()
+        parser = IncrementalParser()
+        tokens, _ = lexer.update(code)
+        start = time.perf_counter()
+        parser.update(tokens, None, lexer.take_edit())
+        full_time = time.perf_counter() - start
+
+        # Change one digit in the middle of the file, then insert a line break there
+        position = code.index('55', len(code) // 2)
+        timings = []
+        for edited in [code[:position] + '7' + code[position + 1:], code[:position] + '\n' + code[position:]]:
+            start = time.perf_counter()
+            tokens, _ = lexer.update(edited)
+            timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            tree, errors = parser.update(tokens, None, lexer.take_edit())
+            timings.append(time.perf_counter() - start)
+            expected = Parser(list(tokens))
+            expected.parse()
+            if errors.records != expected.diagnostics.records or len(tree.body) != len(expected.tree.body):
+                raise AssertionError("Incremental parse differs from a full parse")
+        print(f"{line_count:>8} {full_time * 1000:>7.1f}ms " + ' '.join(f"{timing * 1000:>{width}.1f}ms" for timing, width in zip(timings, [7, 8, 7, 8])))
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [5_000, 50_000, 200_000])
@@ -0,0 +1,39 @@
+#bench_incremental_semantic.py
+import sys
+import time
+from bench_lexer import generate_source
+from lexical_analyzer import IncrementalLexer
+from semantic_analyzer import ALL_CHECKS, IncrementalAnalyzer, SemanticAnalyzer
+from syntax_analyzer import IncrementalParser, Parser
+
+def main(sizes):
+    print(f"{'lines':>8} {'full':>9} {'char edit':>10} {'checked':>8} {'line edit':>10} {'checked':>8}")
+    for line_count in sizes:
+        code = generate_source(line_count)
+        lexer = IncrementalLexer()
+        parser = IncrementalParser()
+        analyzer = IncrementalAnalyzer(ALL_CHECKS)
+        tokens, _ = lexer.update(code)
+        parser.update(tokens, None, lexer.take_edit())
+        start = time.perf_counter()
+        analyzer.update(parser)
+        full_time = time.perf_counter() - start
+
+        # Change one digit in the middle of the file, then insert a line break there
+        position = code.index('55', len(code) // 2)
+        row = []
+        for edited in [code[:position] + '7' + code[position + 1:], code[:position] + '\n' + code[position:]]:
+            tokens, _ = lexer.update(edited)
+            parser.update(tokens, None, lexer.take_edit())
+            start = time.perf_counter()
+            errors = analyzer.update(parser)
+            row += [time.perf_counter() - start, analyzer.checked]
+            expected = Parser(list(tokens))
+            semantic = SemanticAnalyzer(expected.symbols, tokens, None, expected.parse(), ALL_CHECKS)
+            semantic.analyze()
+            if errors.records != semantic.diagnostics.records:
+                raise AssertionError("Incremental analysis differs from a full analysis")
+        print(f"{line_count:>8} {full_time * 1000:>7.1f}ms {row[0] * 1000:>8.2f}ms {row[1]:>8} {row[2] * 1000:>8.2f}ms {row[3]:>8}")
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [5_000, 50_000, 200_000])
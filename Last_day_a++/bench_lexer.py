@@ -0,0 +1,89 @@
+#bench_lexer.py
+import re
+import sys
+import time
+from lexical_analyzer import decode_literal, patterns, tokenize
+
+SAMPLE_LINES = [
+    'integer marks = 55!',
+    'decimal percentage = 50.5!',
+    'line remarks = "Need to improve"!',
+    'flag passed = true!',
+    'iff marks >= 50 {',
+    'remarks = "Passed"!   @ grade check',
+    '}',
+    'rotate(percentage < 60){',
+    'percentage = percentage + 1 * marks - 2 / 3!',
+    '}',
+    'Blank add(integer num1, integer num2){',
+    'integer sum = num1 + num2!',
+    '}',
+    'add(10, 6)!',
+    'showout remarks!',
+]
+
+# Generate a source of the given number of lines from the sample program
+def generate_source(line_count):
+    repeats, rest = divmod(line_count, len(SAMPLE_LINES))
+    return '\n'.join(SAMPLE_LINES * repeats + SAMPLE_LINES[:rest])
+
+# The original slice-per-token scanner, kept only for comparison
+def legacy_tokenize(code):
+    Errors = []
+    tokens = []
+    lines = code.split('\n')
+    for line_number, line in enumerate(lines, start=1):
+        position = 0
+        while position < len(line):
+            if line[position].isspace():
+                position += 1
+                continue
+            match = None
+            for token_type, pattern in patterns.items():
+                match = re.match(pattern, line[position:])
+                if match:
+                    token = match.group(0)
+                    if token_type == 'Identifier':
+                        prev_token_index = len(tokens) - 1
+                        data_type = None
+                        if prev_token_index >= 0 and (tokens[prev_token_index][0] == 'DATA_TYPE' or tokens[prev_token_index][1] == 'Blank'):
+                            data_type = tokens[prev_token_index][1]
+                        while position + len(token) < len(line) and line[position + len(token)].isspace():
+                            position += 1
+                        if position + len(token) < len(line) and line[position + len(token)] == '(':
+                            tokens.append(('FUNCTION', token, line_number, data_type))
+                        else:
+                            tokens.append(('VARIABLE', token, line_number, data_type))
+                    elif token_type == 'COMMENT':
+                        position = len(line)
+                        break
+                    elif token_type in ('LITERAL', 'CONSTANT'):
+                        tokens.append((token_type, token, line_number) + decode_literal(token))
+                    else:
+                        tokens.append((token_type, token, line_number))
+                    position += len(token)
+                    break
+            if not match:
+                Errors.append(f"Lexical error: Unexpected character '{line[position]}' on line {line_number}")
+                position += 1
+
+    return tokens, Errors
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main(sizes):
+    print(f"{'lines':>10} {'tokens':>10} {'legacy tok/s':>14} {'master tok/s':>14} {'speedup':>8}")
+    for size in sizes:
+        code = generate_source(size)
+        (legacy_tokens, _), legacy_time = timed(legacy_tokenize, code)
+        (tokens, _), master_time = timed(tokenize, code)
+        if tokens != legacy_tokens:
+            raise AssertionError(f"Token streams differ for {size} lines")
+        count = len(tokens)
+        print(f"{size:>10} {count:>10} {count / legacy_time:>14.0f} {count / master_time:>14.0f} {legacy_time / master_time:>7.2f}x")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
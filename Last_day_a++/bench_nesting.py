@@ -0,0 +1,51 @@
+#bench_nesting.py
+import sys
+import time
+from lexical_analyzer import tokenize
+from syntax_analyzer import Parser
+from semantic_analyzer import SemanticAnalyzer
+from code_generator import CodeGenerator
+
+# Alternates iff and rotate blocks, one per nesting level, around a single assignment
+def generate_nested_source(depth):
+    lines = ["integer x = 1!"]
+    for level in range(depth):
+        lines.append("iff x > 0 {" if level % 2 == 0 else "rotate(x < 10) {")
+    lines.append("x = x + 1!")
+    lines.append("}" * depth)
+    return "\n".join(lines)
+
+def main(depth):
+    code = generate_nested_source(depth)
+    start = time.perf_counter()
+    tokens, errors = tokenize(code)
+    lex_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parser = Parser(tokens, errors)
+    tree = parser.parse()
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    analyzer = SemanticAnalyzer(parser.symbols, tokens, errors, tree)
+    analyzer.analyze()
+    semantic_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assembly_code = CodeGenerator(parser.symbols, tokens, tree).generate()
+    codegen_time = time.perf_counter() - start
+
+    if len(errors):
+        raise AssertionError(f"Nested program reported errors: {errors.messages()[:5]}")
+    # Every level emits CMP, Jcc, JMP and a label around the innermost MOV/ADD/MOV
+    expected_lines = 1 + 4 * depth + 3
+    if len(assembly_code.split("\n")) != expected_lines:
+        raise AssertionError(f"Expected {expected_lines} lines of assembly, got {len(assembly_code.split(chr(10)))}")
+
+    print(f"{depth} levels, {len(tokens)} tokens")
+    print(f"{'phase':>10} {'seconds':>9}")
+    for phase, elapsed in [('lex', lex_time), ('parse', parse_time), ('semantic', semantic_time), ('codegen', codegen_time)]:
+        print(f"{phase:>10} {elapsed:>9.2f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
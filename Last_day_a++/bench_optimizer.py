@@ -0,0 +1,104 @@
+#bench_optimizer.py
+import sys
+import time
+from code_executor import AssemblyInterpreter
+from code_generator import CodeGenerator
+from lexical_analyzer import tokenize
+from optimizer import ConstantPropagation, TemporaryElimination
+from syntax_analyzer import Parser
+
+# Straight-line arithmetic on constants and copies, with a branch on a known value
+SAMPLE_LINES = [
+    'integer width = 12!',
+    'integer height = width * 2 + 3!',
+    'decimal ratio = height / 4 + 0.5!',
+    'integer area = width * height - width % 5!',
+    'integer copy = area!',
+    'decimal scaled = copy * ratio - 1.25!',
+    'iff width > 10 { area = area + 1! }',
+    'integer total = area + copy * 2 - height / 3!',
+]
+
+# Arithmetic on values read with getinput, which propagation cannot fold
+ARITHMETIC_LINES = [
+    'integer x = 7!',
+    'integer y = 3!',
+    'getinput x!',
+    'integer sum = x * x + y * y - 2 * x * y!',
+    'sum = sum + (x - y) * (x + y) / 3!',
+    'integer mixed = (sum % 11 + x) * (y - 4) - sum / 5!',
+    'x = x + mixed % 7!',
+    'y = y * 2 - x % 3!',
+]
+
+# + on lines, which joins them in order, so its operands cannot be swapped
+STRING_LINES = [
+    'line s = "b"!',
+    'line t = "c"!',
+    'getinput s!',
+    's = "a" + s!',
+    't = s + t!',
+    's = t + s!',
+    'integer n = 4!',
+    'n = 2 * n + n!',
+]
+
+SAMPLES = {'constants': SAMPLE_LINES, 'arithmetic': ARITHMETIC_LINES, 'strings': STRING_LINES}
+
+PIPELINES = {
+    'none': lambda: [],
+    'propagate': lambda: [ConstantPropagation()],
+    'temporaries': lambda: [TemporaryElimination()],
+    'both': lambda: [ConstantPropagation(), TemporaryElimination()],
+}
+
+# Counts the instructions it runs, labels aside
+class CountingInterpreter(AssemblyInterpreter):
+    def __init__(self):
+        super().__init__()
+        self.executed = 0
+
+    def _execute_instruction(self, parts):
+        if not parts[0].endswith(':'):
+            self.executed += 1
+        super()._execute_instruction(parts)
+
+def generate_source(lines, line_count):
+    repeats, rest = divmod(line_count, len(lines))
+    return '\n'.join(lines * repeats + lines[:rest])
+
+def execute(code, constants):
+    interpreter = AssemblyInterpreter()
+    start = time.perf_counter()
+    interpreter.execute(code, constants)
+    return time.perf_counter() - start, {name: value for name, value in interpreter.variables.items() if not name.startswith('TMP')}
+
+def count(code, constants):
+    interpreter = CountingInterpreter()
+    interpreter.execute(code, constants)
+    return interpreter.executed, sum(name.startswith('TMP') for name in interpreter.variables)
+
+def main(sizes):
+    print(f"{'sample':>10} {'lines':>8} {'passes':>12} {'asm':>8} {'executed':>9} {'temps':>7} {'generate':>9} {'run':>8}")
+    for sample, lines in SAMPLES.items():
+        for line_count in sizes:
+            tokens, _ = tokenize(generate_source(lines, line_count))
+            parser = Parser(tokens)
+            tree = parser.parse()
+            expected = None
+            for name, passes in PIPELINES.items():
+                generator = CodeGenerator(parser.symbols, tokens, tree, passes())
+                start = time.perf_counter()
+                code = generator.generate()
+                generate_time = time.perf_counter() - start
+                run_time, values = execute(code, generator.constants)
+                if expected is None:
+                    expected = values
+                elif values != expected:
+                    raise AssertionError(f"Code optimized with {name} computes different values")
+                executed, temporaries = count(code, generator.constants)
+                print(f"{sample:>10} {line_count:>8} {name:>12} {len(generator.assembly_code):>8} {executed:>9} {temporaries:>7}"
+                      f" {generate_time:>8.3f}s {run_time:>7.3f}s")
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [1_000, 10_000, 50_000])
@@ -0,0 +1,25 @@
+#bench_parallel_lexer.py
+import sys
+import time
+from bench_lexer import generate_source
+from lexical_analyzer import tokenize, tokenize_parallel
+
+WORKER_COUNTS = [1, 2, 4, 8, 16]
+
+def main(line_count):
+    code = generate_source(line_count)
+    start = time.perf_counter()
+    expected = tokenize(code)
+    serial_time = time.perf_counter() - start
+    print(f"{line_count} lines, {len(expected[0])} tokens, serial {serial_time:.2f}s")
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for workers in WORKER_COUNTS:
+        start = time.perf_counter()
+        result = tokenize_parallel(code, workers)
+        elapsed = time.perf_counter() - start
+        if result != expected:
+            raise AssertionError(f"Parallel lexing with {workers} workers differs from tokenize()")
+        print(f"{workers:>8} {elapsed:>9.2f} {serial_time / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,45 @@
+#bench_parallel_parser.py
+import sys
+import time
+from diagnostics import Diagnostics
+from lexical_analyzer import tokenize
+from semantic_analyzer import SemanticAnalyzer, analyze_parallel
+from syntax_analyzer import Parser
+
+WORKER_COUNTS = [1, 2, 4, 8, 16]
+
+FUNCTION_TEMPLATE = """Blank f{0}(integer a, integer b){{
+integer s{0} = a + b * 2!
+iff s{0} > 10 {{
+s{0} = s{0} - 1!
+}}
+rotate(s{0} < 100){{
+s{0} = s{0} + a!
+}}
+f{0}(s{0}, 1)!
+}}"""
+
+def generate_functions(count):
+    return "\n".join(FUNCTION_TEMPLATE.format(index) for index in range(count))
+
+def main(function_count):
+    code = generate_functions(function_count)
+    tokens, _ = tokenize(code)
+    start = time.perf_counter()
+    expected = Diagnostics()
+    parser = Parser(tokens, expected)
+    tree = parser.parse()
+    SemanticAnalyzer(parser.symbols, tokens, expected, tree).analyze()
+    serial_time = time.perf_counter() - start
+    print(f"{function_count} functions, {len(tokens)} tokens, serial {serial_time:.2f}s")
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    for workers in WORKER_COUNTS:
+        start = time.perf_counter()
+        result, symbols, errors = analyze_parallel(tokens, workers)
+        elapsed = time.perf_counter() - start
+        if errors != expected or len(result.body) != len(tree.body) or len(symbols.symbols) != len(parser.symbols.symbols):
+            raise AssertionError(f"Parallel analysis with {workers} workers differs from the serial run")
+        print(f"{workers:>8} {elapsed:>9.2f} {serial_time / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
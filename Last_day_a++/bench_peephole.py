@@ -0,0 +1,55 @@
+#bench_peephole.py
+import sys
+import time
+from bench_optimizer import SAMPLES, CountingInterpreter, generate_source
+from code_generator import CodeGenerator
+from lexical_analyzer import tokenize
+from optimizer import ConstantPropagation, TemporaryElimination
+from peephole import RULES, PeepholeOptimizer
+from syntax_analyzer import Parser
+
+# Conditions and loops, each leaving a jump to the label after it
+CONTROL_LINES = [
+    'integer count = 0!',
+    'decimal level = 1.5!',
+    'iff count < 10 { count = count + 1! } otherwise count > 20 { count = count - 1! } then { count = 0! }',
+    'rotate(level < 100) { level = level * 2! }',
+    'repeat(integer i = 0! i < 3! i++) { count = count + i * 2! }',
+    'level = level + count / 4!',
+]
+
+PIPELINES = {
+    'none': lambda: [],
+    'ir passes': lambda: [ConstantPropagation(), TemporaryElimination()],
+}
+
+def execute(code, constants):
+    interpreter = CountingInterpreter()
+    interpreter.execute(code, constants)
+    return interpreter.executed, {name: value for name, value in interpreter.variables.items() if not name.startswith('TMP')}
+
+def main(sizes):
+    rules = [rule.name for rule in RULES]
+    print(f"{'sample':>10} {'lines':>8} {'passes':>10} {'asm':>8} {'peephole':>9} {'executed':>9} {'after':>8} {'time':>7}  "
+          + ' '.join(f"{name:>15}" for name in rules))
+    for sample, lines in dict(SAMPLES, control=CONTROL_LINES).items():
+        for line_count in sizes:
+            tokens, _ = tokenize(generate_source(lines, line_count))
+            parser = Parser(tokens)
+            tree = parser.parse()
+            for name, passes in PIPELINES.items():
+                generator = CodeGenerator(parser.symbols, tokens, tree, passes())
+                code = generator.generate()
+                peephole = PeepholeOptimizer()
+                start = time.perf_counter()
+                optimized = peephole.optimize(generator.assembly_code)
+                elapsed = time.perf_counter() - start
+                executed, values = execute(code, generator.constants)
+                optimized_executed, optimized_values = execute("\n".join(optimized), generator.constants)
+                if values != optimized_values:
+                    raise AssertionError("Peephole optimized code computes different values")
+                print(f"{sample:>10} {line_count:>8} {name:>10} {len(generator.assembly_code):>8} {len(optimized):>9} {executed:>9}"
+                      f" {optimized_executed:>8} {elapsed:>6.3f}s  " + ' '.join(f"{peephole.hits[rule]:>15}" for rule in rules))
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [1_000, 10_000, 50_000])
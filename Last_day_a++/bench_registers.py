@@ -0,0 +1,51 @@
+#bench_registers.py
+import sys
+import time
+from bench_optimizer import SAMPLES, generate_source
+from code_executor import AssemblyInterpreter
+from code_generator import CodeGenerator
+from lexical_analyzer import tokenize
+from optimizer import ConstantPropagation, TemporaryElimination
+from register_allocator import LinearScanAllocator
+from syntax_analyzer import Parser
+
+REGISTER_COUNTS = [4, 16]
+
+# Runs code and returns the run time, the final values of the declared variables and how many
+# variables or locations the interpreter held
+def execute(code, constants, register_mode=False, locations=None):
+    interpreter = AssemblyInterpreter(register_mode)
+    start = time.perf_counter()
+    interpreter.execute(code, constants, locations)
+    elapsed = time.perf_counter() - start
+    values = {name: value for name, value in interpreter.variables.items() if not name.startswith('TMP')}
+    held = len(interpreter.storage) - len(interpreter.constants) if register_mode else len(interpreter.variables)
+    return elapsed, values, held
+
+def main(sizes):
+    print(f"{'sample':>10} {'lines':>8} {'mode':>14} {'asm':>8} {'held':>7} {'spilled':>8} {'run':>8}")
+    for sample, lines in SAMPLES.items():
+        for line_count in sizes:
+            tokens, _ = tokenize(generate_source(lines, line_count))
+            parser = Parser(tokens)
+            tree = parser.parse()
+            generator = CodeGenerator(parser.symbols, tokens, tree, [ConstantPropagation(), TemporaryElimination()])
+            code = generator.generate()
+            runs = [('variables', code, generator.constants, False, None, None),
+                    ('registers', code, generator.constants, True, None, None)]
+            for register_count in REGISTER_COUNTS:
+                allocator = LinearScanAllocator(register_count)
+                allocated = CodeGenerator(parser.symbols, tokens, tree, [ConstantPropagation(), TemporaryElimination(), allocator])
+                runs.append((f"allocated {register_count}", allocated.generate(), allocated.constants, True, allocator.locations, allocator.spilled))
+            expected = None
+            for mode, program, constants, register_mode, locations, spilled in runs:
+                elapsed, values, held = execute(program, constants, register_mode, locations)
+                if expected is None:
+                    expected = values
+                elif values != expected:
+                    raise AssertionError(f"{mode} computes different values")
+                spilled = '' if spilled is None else spilled
+                print(f"{sample:>10} {line_count:>8} {mode:>14} {program.count(chr(10)) + 1:>8} {held:>7} {spilled:>8} {elapsed:>7.3f}s")
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [1_000, 10_000, 50_000])
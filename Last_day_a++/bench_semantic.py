@@ -0,0 +1,38 @@
+#bench_semantic.py
+import sys
+import time
+from bench_parallel_parser import generate_functions
+from diagnostics import Diagnostics
+from lexical_analyzer import tokenize
+from semantic_analyzer import ALL_CHECKS, SemanticAnalyzer
+from syntax_analyzer import Parser
+
+# One pass per check, as when the checks were separate methods, against all checks in one pass
+def run(symbols, tokens, tree, fused):
+    analyzer = SemanticAnalyzer(symbols, tokens, Diagnostics(), tree, ALL_CHECKS)
+    start = time.perf_counter()
+    if fused:
+        analyzer.analyze()
+    else:
+        for check in ALL_CHECKS:
+            analyzer.run([check])
+    return time.perf_counter() - start, analyzer
+
+def main(token_target):
+    function_tokens = len(tokenize(generate_functions(1))[0])
+    code = generate_functions(token_target // function_tokens + 1)
+    tokens, _ = tokenize(code)
+    parser = Parser(tokens)
+    tree = parser.parse()
+    print(f"{len(tokens)} tokens, {len(ALL_CHECKS)} checks")
+    print(f"{'input':>7} {'mode':>9} {'passes':>7} {'seconds':>9} {'errors':>7}")
+    for mode, walked in [('tree', tree), ('tokens', None)]:
+        separate_time, separate = run(parser.symbols, tokens, walked, False)
+        fused_time, fused = run(parser.symbols, tokens, walked, True)
+        if sorted(separate.diagnostics.records) != sorted(fused.diagnostics.records):
+            raise AssertionError(f"Fused {mode} pass reports different errors than separate passes")
+        print(f"{mode:>7} {'separate':>9} {separate.passes:>7} {separate_time:>9.2f} {len(separate.diagnostics):>7}")
+        print(f"{mode:>7} {'fused':>9} {fused.passes:>7} {fused_time:>9.2f} {len(fused.diagnostics):>7}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
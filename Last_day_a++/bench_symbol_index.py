@@ -0,0 +1,66 @@
+#bench_symbol_index.py
+import os
+import sys
+import tempfile
+import time
+from lexical_analyzer import tokenize
+from semantic_analyzer import SemanticAnalyzer
+from symbol_index import SymbolIndex
+from syntax_analyzer import Parser
+
+LIBRARY_TEMPLATE = """integer limit{0} = 100!
+integer clamp{0}(integer value){{
+iff value > limit{0} {{
+value = limit{0}!
+}}
+}}"""
+
+def write_library(directory, number, functions):
+    filename = os.path.join(directory, f"lib{number}.txt")
+    with open(filename, 'w') as file:
+        file.write("\n".join(LIBRARY_TEMPLATE.format(f"{number}x{index}") for index in range(functions)))
+    return filename
+
+def main(file_count, functions):
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = [write_library(directory, number, functions) for number in range(file_count)]
+        index_path = os.path.join(directory, 'symbols.db')
+        timings = []
+        with SymbolIndex(index_path) as index:
+            start = time.perf_counter()
+            index.update(filenames)
+            timings.append(('cold index', time.perf_counter() - start))
+        # A later compile opens the index again; unchanged files are skipped by hash
+        with SymbolIndex(index_path) as index:
+            start = time.perf_counter()
+            changed = index.update(filenames)
+            timings.append(('no change', time.perf_counter() - start))
+            if changed:
+                raise AssertionError(f"Unchanged files were re-indexed: {changed}")
+            write_library(directory, 0, functions + 1)
+            start = time.perf_counter()
+            changed = index.update(filenames)
+            timings.append(('one edit', time.perf_counter() - start))
+            if changed != [os.path.abspath(filenames[0])]:
+                raise AssertionError(f"Expected only lib0.txt to be re-indexed, got {changed}")
+
+            # A program calling one function of every file resolves them all through the index
+            code = "\n".join(f"integer r{number} = clamp{number}x0(1)!" for number in range(file_count))
+            tokens, _ = tokenize(code)
+            parser = Parser(tokens)
+            tree = parser.parse()
+            parser.symbols.external = index
+            start = time.perf_counter()
+            analyzer = SemanticAnalyzer(parser.symbols, tokens, None, tree)
+            analyzer.analyze()
+            timings.append(('resolve', time.perf_counter() - start))
+            if analyzer.errors:
+                raise AssertionError(f"External calls did not resolve: {analyzer.errors[:5]}")
+
+    print(f"{file_count} files, {functions} functions each")
+    print(f"{'step':>12} {'seconds':>9}")
+    for step, elapsed in timings:
+        print(f"{step:>12} {elapsed:>9.3f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200, int(sys.argv[2]) if len(sys.argv) > 2 else 50)
@@ -0,0 +1,45 @@
+#bench_token_store.py
+import sys
+import time
+from bench_lexer import generate_source
+from lexical_analyzer import tokenize
+from token_store import tokenize_compact
+
+# Bytes held by the tuple list: the list, every tuple and each distinct lexeme/line object
+def tuple_list_bytes(tokens):
+    seen = set()
+    total = sys.getsizeof(tokens)
+    for token in tokens:
+        total += sys.getsizeof(token)
+        for field in token:
+            if field is not None and id(field) not in seen:
+                seen.add(id(field))
+                total += sys.getsizeof(field)
+    return total
+
+def store_bytes(store):
+    total = store.nbytes() + sys.getsizeof(store.strings) + sys.getsizeof(store.string_ids)
+    return total + sum(sys.getsizeof(string) for string in store.strings)
+
+def iteration_time(tokens):
+    start = time.perf_counter()
+    count = 0
+    for token_type, lexeme, line_number, *data_type in tokens:
+        if token_type == 'VARIABLE':
+            count += 1
+    return time.perf_counter() - start
+
+def main(sizes):
+    print(f"{'lines':>10} {'tokens':>10} {'tuple B/tok':>12} {'store B/tok':>12} {'tuple iter s':>13} {'store iter s':>13}")
+    for size in sizes:
+        code = generate_source(size)
+        tokens, _ = tokenize(code)
+        store, _ = tokenize_compact(code)
+        if list(store) != tokens:
+            raise AssertionError(f"Token store differs from tuple list for {size} lines")
+        count = len(tokens)
+        print(f"{size:>10} {count:>10} {tuple_list_bytes(tokens) / count:>12.1f} {store_bytes(store) / count:>12.1f}"
+              f" {iteration_time(tokens):>13.3f} {iteration_time(store):>13.3f}")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
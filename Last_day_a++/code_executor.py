@@ -1,27 +1,162 @@
+import operator
+
+# Kinds of the instructions compiled for register mode
+MOVE, COMPUTE, COMPARE, BRANCH, JUMP, SHOWOUT, NOTHING, FAILURE = range(8)
+OPERATIONS = {'ADD': operator.add, 'SUB': operator.sub, 'MUL': operator.mul, 'DIV': operator.floordiv, 'MOD': operator.mod}
+COMPARISONS = {'JL': operator.lt, 'JG': operator.gt, 'JE': operator.eq, 'JNE': operator.ne, 'JLE': operator.le, 'JGE': operator.ge}
+
+# Value of a literal operand written in the assembly text, or None for a variable name
+def decode_operand(operand):
+    if operand.isdigit():
+        return int(operand)
+    try:
+        return float(operand)
+    except ValueError:
+        pass
+    if len(operand) > 1 and operand[0] in '"\'' and operand[-1] == operand[0] and operand[0] not in operand[1:-1]:
+        return operand[1:-1]
+    return None
+
+
+# In register mode every operand, literals included, is compiled to an index into self.storage
+# before running, so an instruction does list accesses instead of parsing and hashing its
+# operand text. An operand that was never written holds None and behaves as in variables.
 class AssemblyInterpreter:
-    def __init__(self):
+    def __init__(self, register_mode=False):
         self.variables = {}
         self.labels = {}
         self.program_counter = 0
         self.stack = []
+        # Operand text of each literal mapped to its value
+        self.constants = {}
+        self.register_mode = register_mode
+        self.storage = []
+        # Index in storage of each operand, and the variable or literal held at each index
+        self.indices = {}
+        self.storage_names = []
 
-    def execute(self, code):
+    # constants is CodeGenerator.constants; literal operands it does not cover are decoded
+    # once here. Instructions are split once, before running; a MOV only up to its source, so
+    # a string keeps its spacing.
+    # locations is LinearScanAllocator.locations for code whose variables were allocated; in
+    # register mode variables then gets the final value of each variable from its location.
+    def execute(self, code, constants=None, locations=None):
         instructions = code.split('\n')
         self._preprocess_labels(instructions)
-        while self.program_counter < len(instructions):
-            instruction = instructions[self.program_counter].strip()
-            if instruction:
-                self._execute_instruction(instruction)
+        if self.register_mode:
+            self._execute_registers(instructions, constants, locations)
+            return
+        program = [self._split(instruction) for instruction in instructions]
+        self._load_constants(program, constants)
+        while self.program_counter < len(program):
+            parts = program[self.program_counter]
+            if parts:
+                self._execute_instruction(parts)
             self.program_counter += 1
 
+    def _load_constants(self, program, constants):
+        if constants:
+            self.constants.update(constants)
+        names = set()
+        for parts in program:
+            for operand in [part.rstrip(',') for part in parts[1:]]:
+                if operand in self.constants or operand in names:
+                    continue
+                value = decode_operand(operand)
+                if value is None:
+                    names.add(operand)
+                else:
+                    self.constants[operand] = value
+
+    def _split(self, instruction):
+        if instruction.split(None, 1)[:1] == ['MOV']:
+            return instruction.strip().split(None, 2)
+        return instruction.split()
+
+    # Each distinct line is compiled once; allocated code repeats lines a lot
+    def _execute_registers(self, instructions, constants, locations):
+        compiled = {instruction: self._split(instruction) for instruction in instructions}
+        self._load_constants(compiled.values(), constants)
+        names = {location: name for name, location in locations.items()} if locations is not None else None
+        for location, name in (names or {}).items():
+            self._index(location, name)
+        for instruction, parts in compiled.items():
+            compiled[instruction] = self._compile(parts)
+        code = [compiled[instruction] for instruction in instructions]
+        storage, storage_names, stack, labels = self.storage, self.storage_names, self.stack, self.labels
+        program_counter = self.program_counter
+        try:
+            while program_counter < len(code):
+                instruction = code[program_counter]
+                kind = instruction[0]
+                if kind == COMPUTE:
+                    _, function, dest, source = instruction
+                    left, right = storage[dest], storage[source]
+                    if left is None:
+                        raise KeyError(storage_names[dest])
+                    storage[dest] = function(left, 0 if right is None else right)
+                elif kind == MOVE:
+                    value = storage[instruction[2]]
+                    storage[instruction[1]] = 0 if value is None else value
+                elif kind == COMPARE:
+                    stack.append(('CMP', instruction[1], instruction[2]))
+                elif kind == BRANCH:
+                    _, left, right = stack.pop()
+                    left, right = storage[left], storage[right]
+                    if instruction[1](0 if left is None else left, 0 if right is None else right):
+                        program_counter = labels[instruction[2]] - 1
+                elif kind == JUMP:
+                    program_counter = labels[instruction[1]] - 1
+                elif kind == SHOWOUT:
+                    stack.append(('OUTPUT', " ".join(str(storage_names[index] if storage[index] is None else storage[index]) for index in instruction[1])))
+                elif kind == FAILURE:
+                    raise ValueError(instruction[1])
+                program_counter += 1
+        finally:
+            self.program_counter = program_counter
+            for location, index in self.indices.items():
+                name = storage_names[index] if names is None else names.get(location)
+                if name is not None and location not in self.constants and storage[index] is not None:
+                    self.variables[name] = storage[index]
+
+    # Index in storage of an operand, added on first sight
+    def _index(self, operand, name=None):
+        operand = operand.rstrip(',')
+        index = self.indices.get(operand)
+        if index is None:
+            index = self.indices[operand] = len(self.storage)
+            self.storage.append(self.constants.get(operand))
+            self.storage_names.append(operand if name is None else name)
+        return index
+
+    # parts as split by execute(), as a tuple of its kind and operands
+    def _compile(self, parts):
+        if not parts or parts[0].endswith(':'):
+            return (NOTHING,)
+        instruction = parts[0]
+        if instruction == 'MOV':
+            return (MOVE, self._index(parts[1]), self._index(' '.join(parts[2:])))
+        elif instruction in OPERATIONS:
+            return (COMPUTE, OPERATIONS[instruction], self._index(parts[1]), self._index(parts[2]))
+        elif instruction == 'CMP':
+            return (COMPARE, self._index(parts[1]), self._index(parts[2]))
+        elif instruction in COMPARISONS or instruction == 'JMP':
+            if len(parts) < 2:
+                return (FAILURE, f"Missing label for jump instruction: {instruction}")
+            return (JUMP, parts[1]) if instruction == 'JMP' else (BRANCH, COMPARISONS[instruction], parts[1])
+        elif instruction == 'CALL':
+            if parts[1] == 'showout':
+                return (SHOWOUT, [self._index(arg) for arg in parts[2:]])
+            return (NOTHING,)
+        return (FAILURE, f"Unknown instruction: {' '.join(parts)}")
+
     def _preprocess_labels(self, instructions):
         for idx, instruction in enumerate(instructions):
             if instruction.endswith(':'):
                 label = instruction.rstrip(':')
                 self.labels[label] = idx
 
-    def _execute_instruction(self, instruction):
-        parts = instruction.split()
+    def _execute_instruction(self, parts):
         if parts[0].endswith(':'):
             return
         if parts[0] == 'MOV':
@@ -34,19 +169,21 @@ class AssemblyInterpreter:
             self._execute_mul(parts[1:])
         elif parts[0] == 'DIV':
             self._execute_div(parts[1:])
+        elif parts[0] == 'MOD':
+            self._execute_mod(parts[1:])
         elif parts[0] == 'CMP':
             self._execute_cmp(parts[1:])
-        elif parts[0] in ['JL', 'JG', 'JE', 'JNE', 'JMP']:
+        elif parts[0] in ['JL', 'JG', 'JE', 'JNE', 'JLE', 'JGE', 'JMP']:
             self._execute_jump(parts[0], parts[1] if len(parts) > 1 else None)
         elif parts[0] == 'CALL':
             self._execute_call(parts[1:])
         else:
-            raise ValueError(f"Unknown instruction: {instruction}")
+            raise ValueError(f"Unknown instruction: {' '.join(parts)}")
 
     def _execute_mov(self, parts):
         dest, src = parts[0], ' '.join(parts[1:])
-        if src.isdigit() or (src[0] == '"' and src[-1] == '"'):
-            self.variables[dest.rstrip(',')] = eval(src)  # Evaluate immediate values
+        if src in self.constants:
+            self.variables[dest.rstrip(',')] = self.constants[src]
         else:
             self.variables[dest.rstrip(',')] = self._evaluate_expression(src)
 
@@ -66,6 +203,10 @@ class AssemblyInterpreter:
         dest, src = parts[0], parts[1]
         self.variables[dest.rstrip(',')] //= self._get_value(src)
 
+    def _execute_mod(self, parts):
+        dest, src = parts[0], parts[1]
+        self.variables[dest.rstrip(',')] %= self._get_value(src)
+
     def _execute_cmp(self, parts):
         left, right = parts[0], parts[1]
         self.stack.append(('CMP', left, right))
@@ -89,6 +230,10 @@ class AssemblyInterpreter:
                 jump = True
             elif jump_type == 'JNE' and left_val != right_val:
                 jump = True
+            elif jump_type == 'JLE' and left_val <= right_val:
+                jump = True
+            elif jump_type == 'JGE' and left_val >= right_val:
+                jump = True
             if jump:
                 self.program_counter = self.labels[label] - 1
 
@@ -97,7 +242,8 @@ class AssemblyInterpreter:
         if function_name == 'showout':
             output = []
             for arg in args:
-                value = self.variables.get(arg.rstrip(','), arg.rstrip(','))
+                arg = arg.rstrip(',')
+                value = self.constants[arg] if arg in self.constants else self.variables.get(arg, arg)
                 output.append(str(value))
             self.stack.append(('OUTPUT', " ".join(output)))
 
@@ -125,17 +271,10 @@ class AssemblyInterpreter:
         return result
 
     def _get_value(self, operand):
-        if operand.isdigit():
-            return int(operand)
-        try:
-            return float(operand)
-        except ValueError:
-            pass
-
-        if operand.startswith('"') and operand.endswith('"'):
-            return operand.strip('"')
-
-        return self.variables.get(operand.rstrip(','), 0)
+        operand = operand.rstrip(',')
+        if operand in self.constants:
+            return self.constants[operand]
+        return self.variables.get(operand, 0)
 
     def debug(self):
         filtered_vars = {key: value for key, value in self.variables.items() if not key.startswith('TMP')}
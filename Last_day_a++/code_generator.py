@@ -1,210 +1,216 @@
 #code_generator.py
-class CodeGenerator:
-    def __init__(self, symbol_table, tokens):
+from ast_nodes import BinaryOp, Call, Literal, NodeVisitor, UnaryOp, Variable
+from ir import ARITHMETIC_OPERATIONS, CONDITIONAL_JUMPS, Branch, Compute, Constant, ControlFlowGraph, Invoke, Jump, Label, Move
+from syntax_analyzer import Parser
+from type_inference import NUMERIC_TYPES, TypeInference
+
+ONE = Constant('1', 1)
+ZERO = Constant('0', 0)
+
+class CodeGenerator(NodeVisitor):
+    # tree is the Program built by Parser.parse() and symbol_table the parser's SymbolTable;
+    # without a tree the tokens are parsed here and the parser's table is used.
+    # generate() builds the program as three-address code in self.graph, runs the optimizer
+    # passes over it in order and prints it; peephole, a PeepholeOptimizer, then rewrites the
+    # printed lines.
+    def __init__(self, symbol_table, tokens, tree=None, passes=(), peephole=None):
         self.tokens = tokens
-        self.current_token_index = 0
-        self.current_token = self.tokens[self.current_token_index] if self.tokens else None
+        self.tree = tree
+        self.passes = passes
+        self.peephole = peephole
+        self.instructions = []
+        self.graph = None
         self.assembly_code = []
         self.symbol_table = symbol_table
         self.label_count = 0
-
-    def advance(self):
-        self.current_token_index += 1
-        if self.current_token_index < len(self.tokens):
-            self.current_token = self.tokens[self.current_token_index]
-        else:
-            self.current_token = None
+        self.types = None
+        # Operand text of every constant in the program, mapped to its value, for AssemblyInterpreter.execute()
+        self.constants = {}
 
     def generate(self):
-        self.program()
+        if self.tree is None:
+            parser = Parser(self.tokens)
+            self.tree = parser.parse()
+            self.symbol_table = parser.symbols
+        self.types = TypeInference(self.symbol_table)
+        # Compound statements schedule their blocks on this work stack instead of visiting them,
+        # so nesting depth is limited only by memory
+        self.pending = [(self.visit, self.tree)]
+        while self.pending:
+            function, argument = self.pending.pop()
+            function(argument)
+        self.graph = ControlFlowGraph(self.instructions)
+        for optimization in self.passes:
+            optimization.run(self.graph, self.symbol_table)
+        self.constants = self.graph.constants()
+        self.assembly_code = self.graph.lines()
+        if self.peephole is not None:
+            self.assembly_code = self.peephole.optimize(self.assembly_code)
         return "\n".join(self.assembly_code)
 
-    def program(self):
-        while self.current_token:
-            self.statement()
-
-    def statement(self):
-        if self.current_token[0] == 'LCURLY':
-            self.advance()
-        elif self.current_token[0] == 'RCURLY':
-            self.advance()
-        elif self.current_token[0] == 'DATA_TYPE':
-            self.declaration()
-        elif self.current_token[0] == 'KEYWORD':
-            if self.current_token[1] in ['iff', 'otherwise', 'then']:
-                self.conditional_statement()
-            elif self.current_token[1] in ['repeat', 'rotate']:
-                self.loop_statement()
-            elif self.current_token[1] == 'Blank':
-                self.function_definition()
-            elif self.current_token[1] == 'resume' or self.current_token[1] == 'stop':
-                self.advance()
-        elif self.current_token[0] == 'FUNCTION':
-            self.function_call()
-            self.advance()
-        elif self.current_token[0] == 'VARIABLE':
-            self.assignment()
-        else:
-            self.advance()
-
-    def declaration(self):
-        data_type = self.current_token[1]
-        self.advance()
-        variable_name = self.current_token[1]
-        self.advance()
-        if self.current_token[0] == 'STATEMENT_END':
-            self.advance()
-        else:
-            self.assignment(variable_name, data_type)
-
-    def assignment(self, variable_name=None, data_type=None):
-        if not variable_name:
-            variable_name = self.current_token[1]
-            self.advance()
-        self.advance()
-        value = self.expression()
-        if data_type:
-            if data_type == 'integer':
-                self.assembly_code.append(f"MOV {variable_name}, {value}")
-            elif data_type == 'decimal':
-                self.assembly_code.append(f"MOV {variable_name}, {value}")
-            elif data_type == 'line':
-                self.assembly_code.append(f"MOV {variable_name}, {value}")
-            elif data_type == 'flag':
-                self.assembly_code.append(f"MOV {variable_name}, {1 if value == 'true' else 0}")
-        else:
-            self.assembly_code.append(f"MOV {variable_name}, {value}")
-
-    def expression(self):
-        left = self.term()
-        while self.current_token and self.current_token[0] == 'OPERATOR' and self.current_token[1] in ['+', '-']:
-            operator = self.current_token[1]
-            self.advance()
-            right = self.term()
+    def emit(self, instruction):
+        self.instructions.append(instruction)
+
+    # Queues (function, argument) pairs to run in the given order once the current one returns
+    def schedule(self, *work):
+        self.pending.extend(reversed(work))
+
+    def visit_Program(self, node):
+        self.schedule(*[(self.visit, statement) for statement in node.body])
+
+    def visit_Block(self, node):
+        self.schedule(*[(self.visit, statement) for statement in node.body])
+
+    def visit_Declaration(self, node):
+        if node.value is None:
+            return
+        value = self.expression(node.value)
+        self.emit(Move(self.symbol_table.storage_name(node), value))
+
+    def visit_Assignment(self, node):
+        value = self.expression(node.value)
+        self.emit(Move(self.symbol_table.storage_name(node), value))
+
+    # Emits the code computing node and returns the operand holding its value. Operands are
+    # computed left to right on an explicit stack, so long operator chains need no recursion.
+    def expression(self, node):
+        values = []
+        pending = [(node, False)]
+        while pending:
+            node, operands_done = pending.pop()
+            if not operands_done and isinstance(node, BinaryOp):
+                pending.append((node, True))
+                pending.append((node.right, False))
+                pending.append((node.left, False))
+            elif not operands_done and isinstance(node, UnaryOp) and not (node.operator in ['++', '--'] and isinstance(node.operand, Variable)):
+                pending.append((node, True))
+                pending.append((node.operand, False))
+            else:
+                values.append(self.operation(node, values))
+        return values[0]
+
+    # Emits node itself once the values of its operands are on top of values
+    def operation(self, node, values):
+        if isinstance(node, Literal):
+            return self.constant(node)
+        elif isinstance(node, Variable):
+            return self.symbol_table.storage_name(node)
+        elif isinstance(node, Call):
+            self.visit_Call(node)
+            return node.name
+        elif isinstance(node, UnaryOp) and node.operator in ['++', '--']:
+            return self.increment(node, values)
+        elif isinstance(node, UnaryOp):
             temp_var = f"TMP{self.new_label()}"
-            self.assembly_code.append(f"MOV {temp_var}, {left}")
-            if operator == '+':
-                self.assembly_code.append(f"ADD {temp_var}, {right}")
-            elif operator == '-':
-                self.assembly_code.append(f"SUB {temp_var}, {right}")
-            left = temp_var
-        return left
-
-    def term(self):
-        left = self.factor()
-        while self.current_token and self.current_token[0] == 'OPERATOR' and self.current_token[1] in ['*', '/', '%']:
-            operator = self.current_token[1]
-            self.advance()
-            right = self.factor()
+            self.emit(Compute('SUB', temp_var, ZERO, values.pop()))
+            return temp_var
+        elif isinstance(node, BinaryOp) and node.operator in CONDITIONAL_JUMPS:
+            # A comparison used as a value is 1 or 0
+            right = values.pop()
+            left = values.pop()
             temp_var = f"TMP{self.new_label()}"
-            self.assembly_code.append(f"MOV {temp_var}, {left}")
-            if operator == '*':
-                self.assembly_code.append(f"MUL {temp_var}, {right}")
-            elif operator == '/':
-                self.assembly_code.append(f"DIV {temp_var}, {right}")
-            elif operator == '%':
-                self.assembly_code.append(f"MOD {temp_var}, {right}")
-            left = temp_var
-        return left
-
-    def factor(self):
-        token = self.current_token
-        token_type, token_value = token[0], token[1]
-        if token_type == 'LITERAL' or token_type == 'VARIABLE' or token_type == 'CONSTANT':
-            self.advance()
-            return token_value
-        elif token_type == 'LPAREN':
-            self.advance()
-            expr = self.expression()
-            if self.current_token[0] == 'RPAREN':
-                self.advance()
-            return expr
-
-    def condition(self):
-        left_operand = self.current_token[1]
-        self.advance()
-        operator = self.current_token[1]
-        self.advance()
-        right_operand = self.current_token[1]
-        self.advance()
-        self.assembly_code.append(f"CMP {left_operand}, {right_operand}")
-        label = self.new_label()
-        if operator == '==':
-            self.assembly_code.append(f"JE L{label}")
-        elif operator == '!=':
-            self.assembly_code.append(f"JNE L{label}")
-        elif operator == '<':
-            self.assembly_code.append(f"JL L{label}")
-        elif operator == '>':
-            self.assembly_code.append(f"JG L{label}")
-        elif operator == '<=':
-            self.assembly_code.append(f"JLE L{label}")
-        elif operator == '>=':
-            self.assembly_code.append(f"JGE L{label}")
-        return label
+            self.emit(Move(temp_var, ONE))
+            label = f"L{self.new_label()}"
+            self.emit(Branch(CONDITIONAL_JUMPS[node.operator], left, right, label))
+            self.emit(Move(temp_var, ZERO))
+            self.emit(Label(label))
+            return temp_var
+        elif isinstance(node, BinaryOp):
+            right = values.pop()
+            left = values.pop()
+            temp_var = f"TMP{self.new_label()}"
+            numeric = self.types.infer(node) in NUMERIC_TYPES
+            self.emit(Compute(ARITHMETIC_OPERATIONS.get(node.operator, node.operator), temp_var, left, right, numeric))
+            return temp_var
+        return None
+
+    # Literals keep their lexeme as operand text, except flags, which become 1 and 0
+    def constant(self, node):
+        if node.data_type == 'flag':
+            return ONE if node.constant else ZERO
+        return Constant(node.value, node.constant)
 
-    def conditional_statement(self):
-        if self.current_token[1] == 'iff':
-            self.advance()
-            label = self.condition()
-            self.assembly_code.append(f"JMP L{label}")
-            self.assembly_code.append(f"L{label}:")
-        elif self.current_token[1] == 'otherwise':
-            self.advance()
-            label = self.condition()
-            self.assembly_code.append(f"JMP L{label}")
-            self.assembly_code.append(f"L{label}:")
-        elif self.current_token[1] == 'then':
-            self.advance()
-            label = self.new_label()
-            self.assembly_code.append(f"JMP L{label}")
-            self.assembly_code.append(f"L{label}:")
-
-    def loop_statement(self):
-        if self.current_token[1] == 'repeat':
-            self.advance()
-            self.advance()
-            self.declaration()
-            label = self.condition()
-            self.assembly_code.append(f"JMP L{label}")
-            self.assembly_code.append(f"L{label}:")
-            self.advance()
-            self.advance()
-        elif self.current_token[1] == 'rotate':
-            self.advance()
-            self.advance()
-            label = self.condition()
-            self.assembly_code.append(f"JMP L{label}")
-            self.assembly_code.append(f"L{label}:")
-            self.advance()
-            self.advance()
-
-    def function_call(self):
-        function_name = self.current_token[1]
-        self.advance()
-        self.advance()
-        args = []
-        while self.current_token[0] != 'RPAREN':
-            args.append(self.current_token[1])
-            self.advance()
-            if self.current_token[0] == 'SEPERATOR':
-                self.advance()
-        self.assembly_code.append(f"CALL {function_name} {', '.join(args)}")
-        self.advance()
-
-    def function_definition(self):
-        if self.current_token[1] == 'Blank':
-            self.advance()
+    # Emits the test of a condition and returns the label it jumps to
+    def condition(self, node):
+        if isinstance(node, BinaryOp) and node.operator in CONDITIONAL_JUMPS:
+            left_operand = self.expression(node.left)
+            right_operand = self.expression(node.right)
+            operator = node.operator
         else:
-            self.advance()
-        function_name = self.current_token[1]
-        self.advance()
-        self.advance()
-        self.assembly_code.append(f"{function_name}:")
-        while self.current_token[0] != 'RPAREN':
-            self.advance()
-        self.advance()
-        self.advance()
+            left_operand, right_operand, operator = self.expression(node), ZERO, '!='
+        label = f"L{self.new_label()}"
+        self.emit(Branch(CONDITIONAL_JUMPS[operator], left_operand, right_operand, label))
+        return label
+
+    def visit_If(self, node):
+        label = self.condition(node.condition)
+        self.emit(Jump(label))
+        self.emit(Label(label))
+        self.schedule((self.visit, node.body), *[(self.visit, alternative) for alternative in node.alternatives])
+
+    def visit_Otherwise(self, node):
+        label = self.condition(node.condition)
+        self.emit(Jump(label))
+        self.emit(Label(label))
+        self.schedule((self.visit, node.body))
+
+    def visit_Then(self, node):
+        label = f"L{self.new_label()}"
+        self.emit(Jump(label))
+        self.emit(Label(label))
+        self.schedule((self.visit, node.body))
+
+    def visit_Repeat(self, node):
+        self.visit(node.init)
+        label = self.condition(node.condition)
+        self.emit(Jump(label))
+        self.emit(Label(label))
+        self.schedule((self.visit, node.body), (self.step, node.step))
+
+    def visit_Rotate(self, node):
+        label = self.condition(node.condition)
+        self.emit(Jump(label))
+        self.emit(Label(label))
+        self.schedule((self.visit, node.body))
+
+    def step(self, node):
+        if isinstance(node, UnaryOp) and node.operator in ['++', '--'] and isinstance(node.operand, Variable):
+            name = self.symbol_table.storage_name(node.operand)
+            self.emit(Compute('ADD' if node.operator == '++' else 'SUB', name, name, ONE))
+        elif node is not None:
+            self.expression(node)
+
+    # x++ and x-- yield the old value, ++x and --x the new one
+    def increment(self, node, values):
+        operation = 'ADD' if node.operator == '++' else 'SUB'
+        if not isinstance(node.operand, Variable):
+            temp_var = f"TMP{self.new_label()}"
+            self.emit(Compute(operation, temp_var, values.pop(), ONE))
+            return temp_var
+        name = self.symbol_table.storage_name(node.operand)
+        if not node.postfix:
+            self.emit(Compute(operation, name, name, ONE))
+            return name
+        temp_var = f"TMP{self.new_label()}"
+        self.emit(Move(temp_var, name))
+        self.emit(Compute(operation, name, name, ONE))
+        return temp_var
+
+    def visit_Call(self, node):
+        args = [self.expression(arg) for arg in node.args]
+        self.emit(Invoke(node.name, args))
+
+    def visit_Showout(self, node):
+        args = [self.expression(arg) for arg in node.args]
+        self.emit(Invoke('showout', args))
+
+    def visit_Getinput(self, node):
+        args = [self.expression(arg) for arg in node.args]
+        self.emit(Invoke('getinput', args))
+
+    def visit_FunctionDef(self, node):
+        self.emit(Label(node.name))
+        self.schedule((self.visit, node.body))
 
     def new_label(self):
         self.label_count += 1
@@ -0,0 +1,73 @@
+#diagnostics.py
+
+# Message templates by diagnostic code; {line} is the record's line, {0}, {1}... its args
+MESSAGES = {
+    'unexpected-character': "Lexical error: Unexpected character '{0}' on line {line}",
+    'undecodable-bytes': "Lexical error: Bytes not valid in {0} on line {line}",
+    'expected-token': "Syntax error: Expected {0}, found {1} at line {line}",
+    'expected-variable': "Syntax error: Expected VARIABLE, found {0} at line {line}",
+    'missing-block-end': "Syntax error: Missing }} of Block at line {line}",
+    'missing-statement-end': "Syntax Error: Missing ! at the end.",
+    'parser-fuel-exhausted': "Syntax error: Parsing stopped after {0} tokens at line {line}",
+    'assignment-type-mismatch': "Semantic error: Type mismatch on line {line}: cannot assign {0} to {1}",
+    'undeclared-variable': "Semantic error: Variable '{0}' used without declaration at line {line}",
+    'undefined-function': "Semantic error: Function '{0}' called without definition at line {line}",
+    'bad-initial-value': "Semantic error: Variable '{0}' is of type {1} but not assigned correctly at line {line}",
+    'missing-operand': "Semantic error: Operator '{0}' requires two operands at line {line}",
+    'operand-types': "Semantic error: Operator '{0}' cannot be applied to {1} and {2} at line {line}",
+    'unary-operand-type': "Semantic error: Operator '{0}' cannot be applied to {1} at line {line}",
+    'undefined-type': "Semantic error: Type not defined at line {line}",
+}
+
+
+class TooManyErrors(Exception):
+    pass
+
+
+# Shared error sink for every phase. Records are (code, line, args) tuples, kept once each in
+# the order they were first reported and only formatted into messages when read.
+class Diagnostics:
+    def __init__(self, max_errors=None):
+        self.records = []
+        self.seen = set()
+        self.max_errors = max_errors
+
+    def full(self):
+        return self.max_errors is not None and len(self.records) >= self.max_errors
+
+    # Raises TooManyErrors once max_errors is reached so the reporting phase can stop early
+    def add(self, record):
+        if self.full():
+            raise TooManyErrors(self.max_errors)
+        if record in self.seen:
+            return
+        self.seen.add(record)
+        self.records.append(record)
+        if self.full():
+            raise TooManyErrors(self.max_errors)
+
+    def report(self, code, line, *args):
+        self.add((code, line, args))
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    @staticmethod
+    def format(record):
+        code, line, args = record
+        return MESSAGES[code].format(*args, line=line)
+
+    def messages(self):
+        return [self.format(record) for record in self.records]
+
+    def __iter__(self):
+        return map(self.format, self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __eq__(self, other):
+        if isinstance(other, Diagnostics):
+            return self.records == other.records
+        return NotImplemented
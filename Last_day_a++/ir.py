@@ -0,0 +1,223 @@
+#ir.py
+# Three-address code between the tree and the text assembly. Operands are variable names (str) or
+# Constant objects; instructions are grouped into basic blocks linked into a control-flow graph,
+# which prints the text AssemblyInterpreter runs.
+
+ARITHMETIC_OPERATIONS = {'+': 'ADD', '-': 'SUB', '*': 'MUL', '/': 'DIV', '%': 'MOD'}
+CONDITIONAL_JUMPS = {'==': 'JE', '!=': 'JNE', '<': 'JL', '>': 'JG', '<=': 'JLE', '>=': 'JGE'}
+# Operations whose operands can be swapped when both are numbers; ADD joins lines in order
+COMMUTATIVE_OPERATIONS = {'ADD', 'MUL'}
+# Variable a Compute prints through when its destination is its right operand
+SCRATCH = 'TMP'
+
+
+# A literal operand; text is how it is written in the assembly. Equal constants have equal text.
+class Constant:
+    __slots__ = ('text', 'value')
+
+    def __init__(self, text, value):
+        self.text = text
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Constant) and self.text == other.text
+
+    def __hash__(self):
+        return hash(self.text)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"Constant({self.text!r}, {self.value!r})"
+
+
+# dest is the variable an instruction writes, None if it writes none
+class Instruction:
+    __slots__ = ()
+    dest = None
+
+    # The operands read
+    def operands(self):
+        return ()
+
+    # The assembly lines printed for the instruction
+    def lines(self):
+        return []
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class Move(Instruction):
+    __slots__ = ('dest', 'source')
+
+    def __init__(self, dest, source):
+        self.dest = dest
+        self.source = source
+
+    def operands(self):
+        return (self.source,)
+
+    def lines(self):
+        return [f"MOV {self.dest}, {self.source}"]
+
+
+# dest = left <operation> right, operation being one of ARITHMETIC_OPERATIONS' instructions.
+# numeric is set when both operands are known to hold numbers.
+class Compute(Instruction):
+    __slots__ = ('operation', 'dest', 'left', 'right', 'numeric')
+
+    def __init__(self, operation, dest, left, right, numeric=False):
+        self.operation = operation
+        self.dest = dest
+        self.left = left
+        self.right = right
+        self.numeric = numeric
+
+    def operands(self):
+        return (self.left, self.right)
+
+    def commutative(self):
+        return self.numeric and self.operation in COMMUTATIVE_OPERATIONS
+
+    # The assembly is two-address, so dest is loaded with left first unless it already holds it
+    def lines(self):
+        if self.dest == self.left:
+            return [f"{self.operation} {self.dest}, {self.right}"]
+        if self.dest == self.right:
+            if self.commutative():
+                return [f"{self.operation} {self.dest}, {self.left}"]
+            return [f"MOV {SCRATCH}, {self.left}", f"{self.operation} {SCRATCH}, {self.right}", f"MOV {self.dest}, {SCRATCH}"]
+        return [f"MOV {self.dest}, {self.left}", f"{self.operation} {self.dest}, {self.right}"]
+
+
+# Compares left with right and jumps to target if condition, one of CONDITIONAL_JUMPS' instructions, holds
+class Branch(Instruction):
+    __slots__ = ('condition', 'left', 'right', 'target')
+
+    def __init__(self, condition, left, right, target):
+        self.condition = condition
+        self.left = left
+        self.right = right
+        self.target = target
+
+    def operands(self):
+        return (self.left, self.right)
+
+    def lines(self):
+        return [f"CMP {self.left}, {self.right}", f"{self.condition} {self.target}"]
+
+
+class Jump(Instruction):
+    __slots__ = ('target',)
+
+    def __init__(self, target):
+        self.target = target
+
+    def lines(self):
+        return [f"JMP {self.target}"]
+
+
+class Invoke(Instruction):
+    __slots__ = ('function', 'args')
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+
+    def operands(self):
+        return tuple(self.args)
+
+    def lines(self):
+        return [f"CALL {self.function} {', '.join(map(str, self.args))}"]
+
+
+# Marks where a label goes in the instruction list given to ControlFlowGraph; it becomes the
+# label of the block it starts
+class Label(Instruction):
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def lines(self):
+        return [f"{self.name}:"]
+
+
+class BasicBlock:
+    __slots__ = ('label', 'instructions', 'successors', 'predecessors')
+
+    def __init__(self, label=None):
+        self.label = label
+        self.instructions = []
+        self.successors = []
+        self.predecessors = []
+
+    # The instruction control leaves the block by, if it ends in a jump
+    def terminator(self):
+        if self.instructions and isinstance(self.instructions[-1], (Branch, Jump)):
+            return self.instructions[-1]
+        return None
+
+    def __repr__(self):
+        return f"BasicBlock({self.label!r}, {len(self.instructions)} instructions)"
+
+
+# Basic blocks in program order. A block starts at each label and after each jump; it falls
+# through to the next block unless it ends in an unconditional Jump.
+class ControlFlowGraph:
+    def __init__(self, instructions=()):
+        self.blocks = []
+        block = None
+        for instruction in instructions:
+            if isinstance(instruction, Label):
+                block = BasicBlock(instruction.name)
+                self.blocks.append(block)
+                continue
+            if block is None:
+                block = BasicBlock()
+                self.blocks.append(block)
+            block.instructions.append(instruction)
+            if isinstance(instruction, (Branch, Jump)):
+                block = None
+        self.link()
+
+    # Recomputes the edges, for passes that changed jumps or removed blocks
+    def link(self):
+        self.labels = {block.label: block for block in self.blocks if block.label is not None}
+        for block in self.blocks:
+            block.successors = []
+            block.predecessors = []
+        for index, block in enumerate(self.blocks):
+            terminator = block.terminator()
+            if terminator is not None:
+                block.successors.append(self.labels[terminator.target])
+            if not isinstance(terminator, Jump) and index + 1 < len(self.blocks):
+                following = self.blocks[index + 1]
+                if following not in block.successors:
+                    block.successors.append(following)
+            for successor in block.successors:
+                successor.predecessors.append(block)
+
+    def instructions(self):
+        for block in self.blocks:
+            yield from block.instructions
+
+    # Every Constant operand, by its text, for AssemblyInterpreter.execute()
+    def constants(self):
+        return {operand.text: operand.value for instruction in self.instructions()
+                for operand in instruction.operands() if isinstance(operand, Constant)}
+
+    def lines(self):
+        lines = []
+        for block in self.blocks:
+            if block.label is not None:
+                lines.append(f"{block.label}:")
+            for instruction in block.instructions:
+                lines.extend(instruction.lines())
+        return lines
+
+    def text(self):
+        return "\n".join(self.lines())
@@ -1,13 +1,24 @@
+import locale
+import mmap
+import os
 import re
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import accumulate, compress, islice
+from diagnostics import Diagnostics, TooManyErrors
+
+# Bump whenever a change to the lexer changes its output, so cached token streams are invalidated
+LEXER_VERSION = 3
 
 # Define token types
 token_types = {
     'KEYWORD': r'\b(?:iff|otherwise|then|repeat|rotate|Blank|resume|stop|null|showout|getinput)\b',
     'DATA_TYPE': r'\b(?:integer|decimal|line|flag|single)\b',
     'OPERATOR': r'(?:<=|>=|==|!=|\+\+|\-\-|\+|\-|\*|/|<|>|%)',
+    'LITERAL': r'\b(?:true|false|-?\d+\.\d*|-?\d+)\b',  # Updated regex
     'Identifier': r'[a-zA-Z][a-zA-Z0-9]*',
     'CONSTANT': r'(?:\".*?\"|\'.*?\')',
-    'LITERAL': r'\b(?:true|false|-?\d+\.\d*|-?\d+)\b',  # Updated regex
     'ASSIGN': r'=',
     'LCURLY': r'{',
     'RCURLY': r'}',
@@ -21,43 +32,463 @@ token_types = {
 # Create regular expressions for tokenization
 patterns = {token: re.compile(pattern) for token, pattern in token_types.items()}
 
-def tokenize(code):
+# All token types in one alternation, tried in the same order as token_types.
+# A leading \b becomes (?=\w) so matching at an offset behaves like matching a slice.
+master_source = '|'.join(
+    '(?P<%s>%s)' % (token, re.sub(r'^\\b', r'(?=\\w)', pattern)) for token, pattern in token_types.items()
+)
+master_pattern = re.compile(master_source)
+whitespace_pattern = re.compile(r'\s+')
+call_pattern = re.compile(r'\s*\(')
+
+# The same scanner over bytes, for lexing memory-mapped files; non-ASCII lines go through the str scanner
+master_bytes_pattern = re.compile(master_source.encode())
+# bytes \s leaves out \x1c-\x1f, which str \s, like str.isspace(), takes as whitespace
+ascii_whitespace = rb'[\t\n\x0b\x0c\r\x1c-\x1f ]'
+whitespace_bytes_pattern = re.compile(ascii_whitespace + rb'+')
+call_bytes_pattern = re.compile(ascii_whitespace + rb'*\(')
+non_ascii_pattern = re.compile(rb'[\x80-\xff]')
+
+# LITERAL and CONSTANT tokens are (type, lexeme, line, A++ type, value): the value is decoded
+# here once, so no later phase parses literal text again
+@lru_cache(maxsize=4096)
+def decode_literal(lexeme):
+    if lexeme == 'true' or lexeme == 'false':
+        return 'flag', lexeme == 'true'
+    if lexeme[0] == '"' or lexeme[0] == "'":
+        text = lexeme[1:-1]
+        return 'single' if lexeme[0] == "'" and len(text) == 1 else 'line', text
+    if '.' in lexeme:
+        return 'decimal', float(lexeme)
+    return 'integer', int(lexeme)
+
+def tokenize_line(line, line_number, prev_token=None):
+    # prev_token is the last token before this line, used for the DATA_TYPE/Blank lookback.
+    # Errors are returned as diagnostic records, see diagnostics.Diagnostics.
     Errors = []
     tokens = []
-    lines = code.split('\n')
-    for line_number, line in enumerate(lines, start=1):
-        position = 0
-        while position < len(line):
-            if line[position].isspace():  # Skip whitespace
-                position += 1
-                continue
-            match = None
-            for token_type, pattern in patterns.items():  # Use patterns instead of token_types
-                match = re.match(pattern, line[position:])
-                if match:
-                    token = match.group(0)
-                    if token_type == 'Identifier':
-                        prev_token_index = len(tokens) - 1
-                        data_type = None  # Default to None
-                        if prev_token_index >= 0 and (tokens[prev_token_index][0] == 'DATA_TYPE' or tokens[prev_token_index][1] == 'Blank'):
-                            data_type = tokens[prev_token_index][1]
-                        while position + len(token) < len(line) and line[position + len(token)].isspace():
-                            position += 1
-                        if position + len(token) < len(line) and line[position + len(token)] == '(':
-                            tokens.append(('FUNCTION', token, line_number, data_type))
-                        else:
-                            tokens.append(('VARIABLE', token, line_number, data_type))
-                    elif token_type == 'COMMENT':
-                        # Skip the comment
-                        position = len(line)
-                        break
-                    else:
-                        tokens.append((token_type, token, line_number))
-                    position += len(token)
-                    break
-            if not match:
-                Errors.append(f"Lexical error: Unexpected character '{line[position]}' on line {line_number}")
-                print(f"Lexical error: Unexpected character '{line[position]}' on line {line_number}")
-                position += 1
+    match_token = master_pattern.match
+    match_space = whitespace_pattern.match
+    is_call = call_pattern.match
+    position = 0
+    length = len(line)
+    while position < length:
+        space = match_space(line, position)
+        if space:
+            position = space.end()
+            continue
+        match = match_token(line, position)
+        if not match:
+            Errors.append(('unexpected-character', line_number, (line[position],)))
+            position += 1
+            continue
+        token_type = match.lastgroup
+        if token_type == 'COMMENT':
+            break
+        token = match.group()
+        position = match.end()
+        if token_type == 'Identifier':
+            prev = tokens[-1] if tokens else prev_token
+            data_type = None
+            if prev is not None and (prev[0] == 'DATA_TYPE' or prev[1] == 'Blank'):
+                data_type = prev[1]
+            if is_call(line, position):
+                tokens.append(('FUNCTION', token, line_number, data_type))
+            else:
+                tokens.append(('VARIABLE', token, line_number, data_type))
+        elif token_type == 'LITERAL' or token_type == 'CONSTANT':
+            tokens.append((token_type, token, line_number) + decode_literal(token))
+        else:
+            tokens.append((token_type, token, line_number))
+    return tokens, Errors
 
+# Scan source[start:end] in place; lexemes caches the decoded str for each distinct lexeme
+def tokenize_bytes_line(source, start, end, line_number, prev_token, lexemes):
+    Errors = []
+    tokens = []
+    match_token = master_bytes_pattern.match
+    match_space = whitespace_bytes_pattern.match
+    is_call = call_bytes_pattern.match
+    position = start
+    while position < end:
+        space = match_space(source, position, end)
+        if space:
+            position = space.end()
+            continue
+        match = match_token(source, position, end)
+        if not match:
+            Errors.append(('unexpected-character', line_number, (chr(source[position]),)))
+            position += 1
+            continue
+        token_type = match.lastgroup
+        if token_type == 'COMMENT':
+            break
+        raw = match.group()
+        token = lexemes.get(raw)
+        if token is None:
+            token = lexemes[raw] = raw.decode('ascii')
+        position = match.end()
+        if token_type == 'Identifier':
+            prev = tokens[-1] if tokens else prev_token
+            data_type = None
+            if prev is not None and (prev[0] == 'DATA_TYPE' or prev[1] == 'Blank'):
+                data_type = prev[1]
+            if is_call(source, position, end):
+                tokens.append(('FUNCTION', token, line_number, data_type))
+            else:
+                tokens.append(('VARIABLE', token, line_number, data_type))
+        elif token_type == 'LITERAL' or token_type == 'CONSTANT':
+            tokens.append((token_type, token, line_number) + decode_literal(token))
+        else:
+            tokens.append((token_type, token, line_number))
     return tokens, Errors
+
+# Returns the tokens and the diagnostics sink; lexing stops early once the sink is full
+def tokenize(code, first_line_number=1, diagnostics=None):
+    Errors = Diagnostics() if diagnostics is None else diagnostics
+    tokens = []
+    prev_token = None
+    try:
+        for line_number, line in enumerate(code.split('\n'), start=first_line_number):
+            line_tokens, line_errors = tokenize_line(line, line_number, prev_token)
+            if line_tokens:
+                tokens.extend(line_tokens)
+                prev_token = line_tokens[-1]
+            if line_errors:
+                Errors.extend(line_errors)
+    except TooManyErrors:
+        pass
+
+    return tokens, Errors
+
+# Decodes one line of source. Bytes not valid in encoding become U+FFFD and are reported, so a
+# file in another encoding gives lexical errors instead of stopping the compile.
+def decode_line(line, encoding, line_number, diagnostics):
+    try:
+        return line.decode(encoding)
+    except UnicodeDecodeError:
+        diagnostics.report('undecodable-bytes', line_number, encoding)
+        return line.decode(encoding, 'replace')
+
+# Lex a bytes-like buffer line by line without copying or decoding whole lines. Only lines with
+# non-ASCII bytes are decoded, so encoding must be ASCII-compatible.
+def tokenize_buffer(source, diagnostics=None, encoding='utf-8'):
+    Errors = Diagnostics() if diagnostics is None else diagnostics
+    tokens = []
+    lexemes = {}
+    prev_token = None
+    size = len(source)
+    start = 0
+    line_number = 1
+    while not Errors.full():
+        end = source.find(b'\n', start)
+        if end < 0:
+            end = size
+        try:
+            if non_ascii_pattern.search(source, start, end):
+                line_tokens, line_errors = tokenize_line(decode_line(source[start:end], encoding, line_number, Errors), line_number, prev_token)
+            else:
+                line_tokens, line_errors = tokenize_bytes_line(source, start, end, line_number, prev_token, lexemes)
+            if line_tokens:
+                tokens.extend(line_tokens)
+                prev_token = line_tokens[-1]
+            if line_errors:
+                Errors.extend(line_errors)
+        except TooManyErrors:
+            break
+        if end == size:
+            break
+        start = end + 1
+        line_number += 1
+    return tokens, Errors
+
+# Lex a source file through a read-only mmap instead of reading it into a str. encoding
+# defaults to the locale's, as for open() in text mode.
+def tokenize_file(filename, diagnostics=None, encoding=None):
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    with open(filename, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return tokenize('', diagnostics=diagnostics)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            return tokenize_buffer(source, diagnostics, encoding)
+
+# Split code into roughly equal runs of whole lines, each with the number of its first line
+def split_chunks(code, count):
+    chunks = []
+    size = len(code) // count + 1
+    start = 0
+    line_number = 1
+    while True:
+        end = code.find('\n', start + size)
+        if end < 0:
+            chunks.append((code[start:], line_number))
+            return chunks
+        chunks.append((code[start:end], line_number))
+        line_number += code.count('\n', start, end) + 1
+        start = end + 1
+
+# Lex line-range chunks on a process pool; gives the same tokens and errors as tokenize(code)
+def tokenize_parallel(code, workers=None, chunks_per_worker=4, diagnostics=None):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return tokenize(code, diagnostics=diagnostics)
+    chunks = split_chunks(code, workers * chunks_per_worker)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(tokenize, [chunk for chunk, _ in chunks], [line for _, line in chunks])
+        Errors = Diagnostics() if diagnostics is None else diagnostics
+        tokens = []
+        for chunk_tokens, chunk_errors in results:
+            # Only a chunk's first token can depend on the previous chunk, through the DATA_TYPE/Blank lookback
+            if chunk_tokens and tokens and chunk_tokens[0][0] in ('FUNCTION', 'VARIABLE'):
+                prev = tokens[-1]
+                data_type = prev[1] if prev[0] == 'DATA_TYPE' or prev[1] == 'Blank' else None
+                chunk_tokens[0] = chunk_tokens[0][:3] + (data_type,)
+            tokens.extend(chunk_tokens)
+            try:
+                Errors.extend(chunk_errors.records)
+            except TooManyErrors:
+                break
+    return tokens, Errors
+
+# Lazily tokenize a file object line by line; lexical errors go to the diagnostics sink if given
+def tokenize_stream(fileobj, diagnostics=None):
+    prev_token = None
+    for line_number, line in enumerate(fileobj, start=1):
+        line_tokens, line_errors = tokenize_line(line.rstrip('\n'), line_number, prev_token)
+        if line_errors and diagnostics is not None:
+            try:
+                diagnostics.extend(line_errors)
+            except TooManyErrors:
+                return
+        if line_tokens:
+            prev_token = line_tokens[-1]
+            yield from line_tokens
+
+
+# Length of the common prefix of two sequences, found by bisection so the comparisons run in C.
+# A str is compared in place with startswith(), so only old is sliced.
+def common_prefix(old, new, limit):
+    text = isinstance(new, str)
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if new.startswith(old[low:middle], low) if text else old[low:middle] == new[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def common_suffix(old, new, limit):
+    text = isinstance(new, str)
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        part = old[len(old) - middle:len(old) - low]
+        if new.endswith(part, 0, len(new) - low) if text else part == new[len(new) - middle:len(new) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+# Caches tokens per line and re-lexes only the lines touched by an edit. A line's tokens keep the
+# line number they were lexed with until they are read: lines added or removed above them only
+# move them in the line lists, so an edit costs the lines it touches, not the lines below it.
+class IncrementalLexer:
+    def __init__(self):
+        self.code = ''
+        self.lines = ['']
+        self.line_tokens = [[]]
+        self.line_errors = [[]]
+        # (type, lexeme) of the token before each line, the only cross-line state of the lexer
+        self.line_context = [None]
+        # (line, position in code of its first character) of the last edit; lines are located by
+        # counting newlines from there, so edits near each other count only the text between them
+        self.anchor = (0, 0)
+        # Index of the first token of each line from offset_line on, for the lines around the
+        # last edits; token_offset() and token_line() extend it on demand
+        self.offset_line = 0
+        self.token_offsets = [0]
+        self.token_count = 0
+        self.error_count = 0
+        # (unchanged leading tokens, unchanged trailing tokens, line shift of the trailing ones)
+        # over all updates since the last take_edit()
+        self.edit = (0, 0, 0)
+        self.tokens = TokenView(self)
+
+    # Extends token_offsets over lines first to last; last may be the line past the end
+    def cover_lines(self, first, last):
+        offsets = self.token_offsets
+        if first < self.offset_line:
+            counts = list(map(len, self.line_tokens[first:self.offset_line]))
+            offsets[:1] = accumulate(counts, initial=offsets[0] - sum(counts))
+            self.offset_line = first
+        known = self.offset_line + len(offsets) - 1
+        if last > known:
+            offsets[len(offsets) - 1:] = accumulate(map(len, self.line_tokens[known:last]), initial=offsets[-1])
+
+    # Index of the first token of line index. Far from the known lines, token_offsets starts
+    # again at index from the total length of the lines in between.
+    def token_offset(self, index):
+        offsets = self.token_offsets
+        known = self.offset_line + len(offsets) - 1
+        if index > known + len(offsets) + 1024:
+            self.token_offsets = [offsets[-1] + sum(map(len, self.line_tokens[known:index]))]
+            self.offset_line = index
+        elif index < self.offset_line - len(offsets) - 1024:
+            self.token_offsets = [offsets[0] - sum(map(len, self.line_tokens[index:self.offset_line]))]
+            self.offset_line = index
+        else:
+            self.cover_lines(index, index)
+        return self.token_offsets[index - self.offset_line]
+
+    # Index of the line holding token index. The known lines are extended in growing steps, so
+    # finding a line near them costs little.
+    def token_line(self, index):
+        step = 64
+        while index < self.token_offsets[0]:
+            self.cover_lines(max(self.offset_line - step, 0), self.offset_line)
+            step *= 2
+        while self.token_offsets[-1] <= index and self.offset_line + len(self.token_offsets) <= len(self.lines):
+            self.cover_lines(self.offset_line, self.offset_line + len(self.token_offsets) - 1 + step)
+            step *= 2
+        return self.offset_line + bisect_right(self.token_offsets, index) - 1
+
+    # Index of the line of self.code holding character position; a line's newline belongs to it
+    def line_at(self, position):
+        line, start = self.anchor
+        if position >= start:
+            return line + self.code.count('\n', start, position)
+        return line - self.code.count('\n', position, start)
+
+    # The tokens of line index, renumbered first if lines above it were added or removed since
+    def numbered_tokens(self, index):
+        line_tokens = self.line_tokens[index]
+        if line_tokens and line_tokens[0][2] != index + 1:
+            line_tokens = self.line_tokens[index] = [(token[0], token[1], index + 1) + token[3:] for token in line_tokens]
+        return line_tokens
+
+    def numbered_errors(self, index):
+        line_errors = self.line_errors[index]
+        if line_errors and line_errors[0][1] != index + 1:
+            line_errors = self.line_errors[index] = [(code, index + 1, args) for code, line, args in line_errors]
+        return line_errors
+
+    def context_after(self, index):
+        if index < 0:
+            return None
+        if self.line_tokens[index]:
+            return self.line_tokens[index][-1][:2]
+        return self.line_context[index]
+
+    # Returns self.tokens, a read-only view of the tokens of code, and the lexical errors
+    def update(self, code, diagnostics=None):
+        old_code = self.code
+        limit = min(len(old_code), len(code))
+        prefix = common_prefix(old_code, code, limit)
+        suffix = common_suffix(old_code, code, limit - prefix)
+        # Whole lines covering the edited text, in both the old and the new buffer
+        start = self.line_at(prefix)
+        old_end = start + old_code.count('\n', prefix, len(old_code) - suffix) + 1
+        region_start = code.rfind('\n', 0, prefix) + 1
+        region_end = code.find('\n', len(code) - suffix)
+        new_lines = code[region_start:region_end if region_end >= 0 else len(code)].split('\n')
+        new_end = start + len(new_lines)
+        shift = new_end - old_end
+        self.code = code
+
+        lexed_tokens, lexed_errors, lexed_context = [], [], []
+        context = self.context_after(start - 1)
+        for index, line in enumerate(new_lines, start=start):
+            line_tokens, line_errors = tokenize_line(line, index + 1, context)
+            lexed_tokens.append(line_tokens)
+            lexed_errors.append(line_errors)
+            lexed_context.append(context)
+            if line_tokens:
+                context = line_tokens[-1][:2]
+        # Unchanged lines after the edit are re-lexed only while the DATA_TYPE/Blank lookback differs
+        stop = old_end
+        while stop < len(self.lines) and self.line_context[stop] != context:
+            line = self.lines[stop]
+            line_tokens, line_errors = tokenize_line(line, stop + shift + 1, context)
+            new_lines.append(line)
+            lexed_tokens.append(line_tokens)
+            lexed_errors.append(line_errors)
+            lexed_context.append(context)
+            if line_tokens:
+                context = line_tokens[-1][:2]
+            stop += 1
+
+        # In this order token_offsets ends up covering start, which keeps its lines up to there
+        token_end = self.token_offset(stop)
+        token_start = self.token_offset(start)
+        lexed_count = sum(map(len, lexed_tokens))
+        prefix, suffix, line_shift = self.edit
+        self.edit = (min(prefix, token_start), min(suffix, self.token_count - token_end), line_shift + shift)
+        self.token_count += lexed_count - (token_end - token_start)
+        self.error_count += sum(map(len, lexed_errors)) - sum(map(len, self.line_errors[start:stop]))
+        self.lines[start:stop] = new_lines
+        self.line_tokens[start:stop] = lexed_tokens
+        self.line_errors[start:stop] = lexed_errors
+        self.line_context[start:stop] = lexed_context
+        self.anchor = (start, region_start)
+        del self.token_offsets[start - self.offset_line + 1:]
+
+        errors = Diagnostics() if diagnostics is None else diagnostics
+        if self.error_count:
+            try:
+                for index in compress(range(len(self.line_errors)), self.line_errors):
+                    errors.extend(self.numbered_errors(index))
+            except TooManyErrors:
+                pass
+        return self.tokens, errors
+
+    # Tokens from index on, in order, read line by line as they are taken
+    def tokens_from(self, index):
+        if index >= self.token_count:
+            return
+        line = self.token_line(index)
+        yield from self.numbered_tokens(line)[index - self.token_offset(line):]
+        for line in range(line + 1, len(self.line_tokens)):
+            if self.line_tokens[line]:
+                yield from self.numbered_tokens(line)
+
+    # The edit since the last call, for IncrementalParser.update()
+    def take_edit(self):
+        edit = self.edit
+        self.edit = (self.token_count, self.token_count, 0)
+        return edit
+
+
+# The tokens of an IncrementalLexer as a read-only sequence, read from its line cache, so that
+# update() hands them out without copying them and callers cannot change its cache. It follows
+# the lexer through later updates; take list() of it to keep the tokens of one version.
+class TokenView:
+    def __init__(self, lexer):
+        self.lexer = lexer
+
+    def __len__(self):
+        return self.lexer.token_count
+
+    def __iter__(self):
+        return self.lexer.tokens_from(0)
+
+    def __getitem__(self, index):
+        lexer = self.lexer
+        if isinstance(index, slice):
+            start, stop, step = index.indices(lexer.token_count)
+            return list(islice(lexer.tokens_from(start), max(stop - start, 0)))[::step] if step > 0 else list(self)[index]
+        if index < 0:
+            index += lexer.token_count
+        if not 0 <= index < lexer.token_count:
+            raise IndexError('token index out of range')
+        line = lexer.token_line(index)
+        return lexer.numbered_tokens(line)[index - lexer.token_offset(line)]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, TokenView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TokenView({list(self)!r})"
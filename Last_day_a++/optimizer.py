@@ -0,0 +1,375 @@
+#optimizer.py
+# Passes over the ControlFlowGraph built by CodeGenerator. Each has run(graph, symbol_table),
+# which rewrites the graph in place and returns the number of assembly lines it removed.
+import math
+import operator
+from collections import Counter
+from ir import Branch, Compute, Constant, Invoke, Jump, Move
+
+# The interpreter's own operations, so a folded value is the one running the code gives;
+# DIV floors decimals too
+OPERATIONS = {'ADD': operator.add, 'SUB': operator.sub, 'MUL': operator.mul, 'DIV': operator.floordiv, 'MOD': operator.mod}
+COMPARISONS = {'JE': operator.eq, 'JNE': operator.ne, 'JL': operator.lt, 'JG': operator.gt, 'JLE': operator.le, 'JGE': operator.ge}
+# Python types of the values a variable of each declared type may hold
+DECLARED_VALUES = {'integer': (int,), 'decimal': (int, float), 'line': (str,), 'single': (str,), 'flag': (int,)}
+
+
+# A Constant for a value computed at compile time, None if it has no literal text
+def make_constant(value):
+    if isinstance(value, int):
+        return Constant(str(value), value)
+    if isinstance(value, float):
+        return Constant(repr(value), value) if math.isfinite(value) else None
+    if isinstance(value, str) and '"' not in value:
+        return Constant(f'"{value}"', value)
+    return None
+
+# value of operation applied to two constants, None if it is not folded: only numbers are
+# folded, and lines joined by ADD
+def fold(operation, left, right):
+    left, right = left.value, right.value
+    if isinstance(left, str) or isinstance(right, str):
+        if not (operation == 'ADD' and isinstance(left, str) and isinstance(right, str)):
+            return None
+    try:
+        return OPERATIONS[operation](left, right)
+    except (ArithmeticError, KeyError):
+        return None
+
+# The interpreter reads a MOV source up to the end of the line; any other operand is split on
+# whitespace and has a trailing comma stripped
+def fits(constant, instruction):
+    return isinstance(instruction, Move) or len(constant.text.split()) == 1 and not constant.text.endswith(',')
+
+
+# Names CodeGenerator gives its temporaries; a declared variable may look like one
+TEMPORARY_PREFIX = 'TMP'
+
+# Interpreter variable of every variable the symbol table declares
+def declared_types(symbol_table):
+    declared = {}
+    if symbol_table is not None:
+        for symbol in symbol_table:
+            if symbol.kind in ('VARIABLE', 'PARAMETER'):
+                declared[symbol_table.variable_name(symbol)] = symbol.data_type
+    return declared
+
+# instruction with its variables renamed by names
+def renamed(instruction, names):
+    if not names or instruction.dest not in names and not any(name in names for name in instruction.operands()):
+        return instruction
+    if isinstance(instruction, Move):
+        return Move(names.get(instruction.dest, instruction.dest), names.get(instruction.source, instruction.source))
+    elif isinstance(instruction, Compute):
+        return Compute(instruction.operation, names.get(instruction.dest, instruction.dest),
+                       names.get(instruction.left, instruction.left), names.get(instruction.right, instruction.right), instruction.numeric)
+    elif isinstance(instruction, Branch):
+        return Branch(instruction.condition, names.get(instruction.left, instruction.left), names.get(instruction.right, instruction.right), instruction.target)
+    elif isinstance(instruction, Invoke):
+        return Invoke(instruction.function, [names.get(arg, arg) for arg in instruction.args])
+    return instruction
+
+# The tracked variables live at the entry and at the exit of each block, iterated backwards to a
+# fixed point. Nothing is live after the last block.
+def liveness(graph, tracked):
+    uses, defines = {}, {}
+    for block in graph.blocks:
+        used, defined = set(), set()
+        for instruction in block.instructions:
+            used.update(name for name in instruction.operands() if name in tracked and name not in defined)
+            if instruction.dest in tracked:
+                defined.add(instruction.dest)
+        uses[block], defines[block] = used, defined
+    live_in = {block: set() for block in graph.blocks}
+    live_out = {block: set() for block in graph.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(graph.blocks):
+            live = set().union(*[live_in[successor] for successor in block.successors])
+            incoming = uses[block] | (live - defines[block])
+            if live != live_out[block] or incoming != live_in[block]:
+                live_out[block] = live
+                live_in[block] = incoming
+                changed = True
+    return live_in, live_out
+
+# The tracked variables written on every path to the entry of each block
+def definitely_assigned(graph, tracked):
+    defines = {block: {instruction.dest for instruction in block.instructions if instruction.dest in tracked} for block in graph.blocks}
+    assigned = {block: set(tracked) if block.predecessors else set() for block in graph.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in graph.blocks:
+            if block.predecessors:
+                incoming = set.intersection(*[assigned[predecessor] | defines[predecessor] for predecessor in block.predecessors])
+                if incoming != assigned[block]:
+                    assigned[block] = incoming
+                    changed = True
+    return assigned
+
+# Variables written or read in more than one block
+def shared_names(graph):
+    seen = {}
+    shared = set()
+    for block in graph.blocks:
+        for instruction in block.instructions:
+            for name in (instruction.dest,) + instruction.operands():
+                if isinstance(name, str) and seen.setdefault(name, block) is not block:
+                    shared.add(name)
+    return shared
+
+
+# Folds operations on constants and replaces uses of a variable by the constant or variable last
+# copied into it, in straight-line code and across blocks. The facts holding at a block's entry
+# are those holding at the exit of every predecessor, found by iterating to a fixed point; only
+# facts about variables found in more than one block, typically no temporaries, leave a block.
+# Calls other than showout may change any variable and clear every fact. A constant is only
+# tracked in a variable whose declared type can hold it, so code with a type error is left as it is.
+class ConstantPropagation:
+    def __init__(self):
+        self.folded = 0
+        self.branches = 0
+        self.removed = 0
+
+    def run(self, graph, symbol_table=None):
+        self.declared = declared_types(symbol_table)
+        self.shared = shared_names(graph)
+        lines = len(graph.lines())
+        exits = {}
+        changed = True
+        while changed:
+            changed = False
+            for index, block in enumerate(graph.blocks):
+                facts = self.entry_facts(block, index, exits)
+                if facts is None:
+                    continue
+                facts = self.transfer(block, facts)
+                if exits.get(block) != facts:
+                    exits[block] = facts
+                    changed = True
+        for index, block in enumerate(graph.blocks):
+            self.transfer(block, self.entry_facts(block, index, exits) or {}, True)
+        graph.link()
+        removed = lines - len(graph.lines())
+        self.removed += removed
+        return removed
+
+    # The facts every predecessor agrees on; None while no predecessor has been reached yet
+    def entry_facts(self, block, index, exits):
+        if index == 0 or not block.predecessors:
+            return {}
+        reached = [exits[predecessor] for predecessor in block.predecessors if predecessor in exits]
+        if not reached:
+            return None
+        facts = reached[0]
+        for other in reached[1:]:
+            facts = {name: value for name, value in facts.items() if other.get(name) == value}
+        return facts
+
+    # Runs the block from facts, a dict of variable -> Constant or variable it holds a copy of,
+    # and returns the facts at its exit; with rewrite, the block's instructions are replaced too
+    def transfer(self, block, facts, rewrite=False):
+        facts = dict(facts)
+        # variable -> variables holding a copy of it
+        copies = {}
+        for name, value in facts.items():
+            if isinstance(value, str):
+                copies.setdefault(value, set()).add(name)
+        instructions = []
+        for instruction in block.instructions:
+            instruction = self.visit(instruction, facts, copies, rewrite)
+            if instruction is not None:
+                instructions.append(instruction)
+        if rewrite:
+            block.instructions = instructions
+        return {name: value for name, value in facts.items() if name in self.shared}
+
+    def visit(self, instruction, facts, copies, rewrite):
+        if isinstance(instruction, Move):
+            source = self.substitute(instruction.source, instruction, facts)
+            self.assign(instruction.dest, source, facts, copies)
+            return Move(instruction.dest, source)
+        elif isinstance(instruction, Compute):
+            dest = instruction.dest
+            left = self.substitute(instruction.left, instruction, facts)
+            right = self.substitute(instruction.right, instruction, facts)
+            if isinstance(left, Constant) and isinstance(right, Constant):
+                constant = make_constant(fold(instruction.operation, left, right))
+                if constant is not None and self.holds(dest, constant):
+                    if rewrite:
+                        self.folded += 1
+                    self.assign(dest, constant, facts, copies)
+                    return Move(dest, constant)
+            # Operands naming dest stay as they are, so the instruction still prints as one line
+            if instruction.left == dest or left == dest:
+                left = instruction.left
+            if instruction.right == dest or right == dest:
+                right = instruction.right
+            self.kill(dest, facts, copies)
+            return Compute(instruction.operation, dest, left, right, instruction.numeric)
+        elif isinstance(instruction, Branch):
+            left = self.substitute(instruction.left, instruction, facts)
+            right = self.substitute(instruction.right, instruction, facts)
+            if isinstance(left, Constant) and isinstance(right, Constant):
+                try:
+                    taken = COMPARISONS[instruction.condition](left.value, right.value)
+                except TypeError:
+                    return Branch(instruction.condition, left, right, instruction.target)
+                if rewrite:
+                    self.branches += 1
+                return Jump(instruction.target) if taken else None
+            return Branch(instruction.condition, left, right, instruction.target)
+        elif isinstance(instruction, Invoke):
+            # showout prints a variable never set by its name, so only constants replace its arguments
+            if instruction.function == 'showout':
+                args = [self.substitute(arg, instruction, facts) for arg in instruction.args]
+                return Invoke('showout', [arg if isinstance(arg, Constant) else original for arg, original in zip(args, instruction.args)])
+            facts.clear()
+            copies.clear()
+        return instruction
+
+    def substitute(self, operand, instruction, facts):
+        value = facts.get(operand) if isinstance(operand, str) else None
+        if value is None or isinstance(value, Constant) and not fits(value, instruction):
+            return operand
+        return value
+
+    # A variable of a declared type only takes constants that type can hold
+    def holds(self, name, constant):
+        allowed = DECLARED_VALUES.get(self.declared.get(name))
+        return allowed is None or isinstance(constant.value, allowed)
+
+    def assign(self, dest, source, facts, copies):
+        self.kill(dest, facts, copies)
+        if source == dest or isinstance(source, Constant) and not self.holds(dest, source):
+            return
+        facts[dest] = source
+        if isinstance(source, str):
+            copies.setdefault(source, set()).add(dest)
+
+    # dest is written: forget what it held and the copies made of it
+    def kill(self, dest, facts, copies):
+        value = facts.pop(dest, None)
+        if isinstance(value, str):
+            copies[value].discard(dest)
+        for name in copies.pop(dest, ()):
+            del facts[name]
+
+
+# Cuts the temporaries CodeGenerator makes for every operation, using their liveness:
+# - an operation whose temporary is only copied into the next instruction's destination writes
+#   that destination directly;
+# - an operation on a temporary that dies there, or a copy of one, puts its result in that
+#   temporary, so it prints as one instruction and the interpreter keeps fewer variables;
+# - writes to temporaries nothing reads are removed, except divisions that may fail at run time.
+# Declared variables are always kept, since their final values are the program's result.
+class TemporaryElimination:
+    def __init__(self):
+        self.coalesced = 0
+        self.dead = 0
+        self.removed = 0
+
+    def run(self, graph, symbol_table=None):
+        declared = declared_types(symbol_table)
+        temporaries = set()
+        definitions = Counter()
+        for instruction in graph.instructions():
+            for name in (instruction.dest,) + instruction.operands():
+                if isinstance(name, str) and name.startswith(TEMPORARY_PREFIX) and name not in declared:
+                    temporaries.add(name)
+            if instruction.dest in temporaries:
+                definitions[instruction.dest] += 1
+        lines = len(graph.lines())
+        live_in, live_out = liveness(graph, temporaries)
+        # An operation printed in place reads its destination directly, which fails if it was never
+        # written, where reading it as an operand gives 0. Only operands of operations read before
+        # their block writes them need checking across blocks.
+        exposed = set()
+        for block in graph.blocks:
+            written = set()
+            for instruction in block.instructions:
+                if isinstance(instruction, Compute):
+                    exposed.update(name for name in instruction.operands() if isinstance(name, str) and name not in written)
+                written.add(instruction.dest)
+        assigned = definitely_assigned(graph, exposed)
+        for block in graph.blocks:
+            self.coalesce(block, live_out[block], assigned[block], temporaries, definitions)
+        removed = True
+        while removed:
+            live_in, live_out = liveness(graph, temporaries)
+            removed = sum(self.remove_dead(block, live_out[block], temporaries) for block in graph.blocks)
+        removed = lines - len(graph.lines())
+        self.removed += removed
+        return removed
+
+    def coalesce(self, block, live_out, assigned, temporaries, definitions):
+        instructions = block.instructions
+        # Index of the last instruction naming each variable
+        last = {}
+        for index, instruction in enumerate(instructions):
+            for name in (instruction.dest,) + instruction.operands():
+                if isinstance(name, str):
+                    last[name] = index
+        dies = lambda name, index: name in temporaries and last.get(name) == index and name not in live_out
+        # The result of a temporary defined once, here, is only read further on in this block
+        block_local = lambda name: name in temporaries and definitions[name] == 1 and name not in live_out
+        assigned = set(assigned)
+        names = {}
+        result = []
+        index = 0
+        following = renamed(instructions[0], names) if instructions else None
+        while index < len(instructions):
+            instruction = following
+            following = renamed(instructions[index + 1], names) if index + 1 < len(instructions) else None
+            dest = instruction.dest
+            if (isinstance(instruction, Compute) and isinstance(following, Move) and following.source == dest and dies(dest, index + 1)
+                    and (following.dest != instruction.right or instruction.commutative())
+                    and (following.dest not in instruction.operands() or following.dest in assigned)):
+                assigned.add(following.dest)
+                result.append(Compute(instruction.operation, following.dest, instruction.left, instruction.right, instruction.numeric))
+                self.coalesced += 1
+                following = renamed(instructions[index + 2], names) if index + 2 < len(instructions) else None
+                index += 2
+                continue
+            assigned.add(dest)
+            if (isinstance(instruction, Compute) and block_local(dest) and instruction.left != instruction.right and dies(instruction.left, index)
+                    and instruction.left in assigned):
+                assigned.add(instruction.left)
+                names[dest] = instruction.left
+                last[instruction.left] = last[dest]
+                following = following and renamed(following, names)
+                result.append(Compute(instruction.operation, instruction.left, instruction.left, instruction.right, instruction.numeric))
+                self.coalesced += 1
+            elif isinstance(instruction, Move) and block_local(dest) and dies(instruction.source, index):
+                names[dest] = instruction.source
+                last[instruction.source] = last[dest]
+                following = following and renamed(following, names)
+                self.coalesced += 1
+            else:
+                result.append(instruction)
+            index += 1
+        block.instructions = result
+
+    # Drops the writes to temporaries not live after them; returns how many
+    def remove_dead(self, block, live_out, temporaries):
+        live = set(live_out)
+        kept = []
+        for instruction in reversed(block.instructions):
+            dest = instruction.dest
+            if dest in temporaries and dest not in live and self.removable(instruction):
+                continue
+            live.discard(dest)
+            live.update(name for name in instruction.operands() if name in temporaries)
+            kept.append(instruction)
+        dead = len(block.instructions) - len(kept)
+        self.dead += dead
+        block.instructions = kept[::-1]
+        return dead
+
+    def removable(self, instruction):
+        if isinstance(instruction, Compute) and instruction.operation in ['DIV', 'MOD']:
+            right = instruction.right
+            return isinstance(right, Constant) and not isinstance(right.value, str) and right.value != 0
+        return True
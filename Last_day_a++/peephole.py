@@ -0,0 +1,183 @@
+#peephole.py
+import re
+from collections import Counter
+
+# Instructions writing the variable named by their first operand
+WRITES = ['MOV', 'ADD', 'SUB', 'MUL', 'DIV', 'MOD']
+TEMPORARY = re.compile(r'\bTMP\d+\b')
+NUMBER = re.compile(r'-?\d+(\.\d*)?')
+
+
+# A rewrite of consecutive assembly lines. patterns holds one regular expression per line; a
+# group name used in several patterns must match the same text in each. rewrite gets the
+# optimizer and the groups and returns the replacement lines, or None to keep the lines. The
+# replacement must be shorter, or the same length, so that rewriting ends.
+class PeepholeRule:
+    def __init__(self, name, patterns, rewrite):
+        self.name = name
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.rewrite = rewrite
+        # The line_key() of the lines the last pattern can match, None if it is not fixed
+        last = patterns[-1]
+        opcode = re.match(r'[A-Z]+(?= )', last)
+        self.key = opcode.group(0) if opcode else ':' if last.endswith(':') else None
+
+    # Groups of the match against the last lines, or None. The last line is tried first, since
+    # it is the one telling rules apart.
+    def match(self, lines):
+        if len(lines) < len(self.patterns):
+            return None
+        found = self.patterns[-1].fullmatch(lines[-1])
+        if found is None:
+            return None
+        groups = found.groupdict()
+        for index in range(2, len(self.patterns) + 1):
+            found = self.patterns[-index].fullmatch(lines[-index])
+            if found is None:
+                return None
+            for name, text in found.groupdict().items():
+                if groups.setdefault(name, text) != text:
+                    return None
+        return groups
+
+
+# JMP Lx right before Lx:, left by every condition and loop
+def jump_to_next(optimizer, groups):
+    return [f"{groups['label']}:"]
+
+# MOV a, a, unless a may never have been written: the move then sets it to 0
+def self_move(optimizer, groups):
+    return [] if optimizer.written(groups['name']) else None
+
+# MOV TMPn, a then MOV b, TMPn, with TMPn used nowhere else
+def move_chain(optimizer, groups):
+    if optimizer.uses[groups['temporary']] != 2:
+        return None
+    return [f"MOV {groups['dest']}, {groups['source']}"]
+
+# Operands of operation can be swapped. The lines carry no types, and ADD joins lines in order,
+# so ADD only swaps with a number, which a line cannot be added to either way.
+def swappable(operation, source):
+    return operation == 'MUL' or operation == 'ADD' and NUMBER.fullmatch(source) is not None
+
+# MOV TMPn, a, an operation on TMPn and MOV b, TMPn, with TMPn used nowhere else, do the
+# operation on b. The operation reads b directly where b is a or its operand, so b must hold a
+# value there.
+def operation_chain(optimizer, groups):
+    temporary, dest, source = groups['temporary'], groups['dest'], groups['source']
+    operation, operand = groups['operation'], groups['operand']
+    if optimizer.uses[temporary] != 3:
+        return None
+    if dest == operand:
+        if swappable(operation, source) and optimizer.written(dest):
+            return [f"{operation} {dest}, {source}"]
+        return None
+    if dest == source and optimizer.written(dest):
+        return [f"{operation} {dest}, {operand}"]
+    return [f"MOV {dest}, {source}", f"{operation} {dest}, {operand}"]
+
+RULES = [
+    PeepholeRule('jump-to-next', [r'JMP (?P<label>\S+)', r'(?P<label>\S+):'], jump_to_next),
+    PeepholeRule('self-move', [r'MOV (?P<name>[^\s,]+), (?P=name)'], self_move),
+    PeepholeRule('move-chain', [r'MOV (?P<temporary>TMP\d+), (?P<source>.+)', r'MOV (?P<dest>[^\s,]+), (?P<temporary>TMP\d+)'], move_chain),
+    PeepholeRule('operation-chain', [r'MOV (?P<temporary>TMP\d+), (?P<source>[^\s,]+)',
+                                     r'(?P<operation>ADD|SUB|MUL|DIV|MOD) (?P<temporary>TMP\d+), (?P<operand>[^\s,]+)',
+                                     r'MOV (?P<dest>[^\s,]+), (?P<temporary>TMP\d+)'], operation_chain),
+]
+
+
+# Instruction of line, or ':' for a label
+def line_key(line):
+    return ':' if line.endswith(':') else line.partition(' ')[0]
+
+# The variable line writes, or None
+def written_name(line):
+    parts = line.split(None, 2)
+    if len(parts) > 1 and parts[0] in WRITES:
+        return parts[1].rstrip(',')
+    return None
+
+
+# Slides a window over the lines CodeGenerator.generate() printed: each line is appended to the
+# output and the rules are tried against the end of it until none applies, so a rewrite can
+# complete a pattern with the lines before it. hits counts the rewrites of each rule.
+class PeepholeOptimizer:
+    def __init__(self, rules=None):
+        self.rules = RULES if rules is None else rules
+        # The rules that can match at each line_key() of the last line, in order
+        self.any_line = [rule for rule in self.rules if rule.key is None]
+        self.table = {rule.key: [other for other in self.rules if other.key in (rule.key, None)]
+                      for rule in self.rules if rule.key is not None}
+        self.hits = Counter()
+        self.removed = 0
+        self.output = []
+        # Appearances of each temporary in the lines being optimized
+        self.uses = Counter()
+        # Index in output of the first line after the last label, and how many lines from there
+        # write each variable
+        self.region = 0
+        self.writes = Counter()
+        # Index in output of the lines a rule is looking at
+        self.window = 0
+
+    def optimize(self, lines):
+        self.uses = Counter(TEMPORARY.findall("\n".join(lines)))
+        self.output = []
+        self.region = 0
+        self.writes = Counter()
+        for line in lines:
+            self.append(line)
+            self.rewrite()
+        self.removed += len(lines) - len(self.output)
+        return self.output
+
+    def append(self, line):
+        self.output.append(line)
+        if line.endswith(':'):
+            self.region = len(self.output)
+            self.writes.clear()
+        else:
+            name = written_name(line)
+            if name is not None:
+                self.writes[name] += 1
+
+    def rewrite(self):
+        output = self.output
+        applied = True
+        while applied:
+            applied = False
+            for rule in self.table.get(line_key(output[-1]), self.any_line) if output else ():
+                groups = rule.match(output)
+                if groups is None:
+                    continue
+                self.window = len(output) - len(rule.patterns)
+                replacement = rule.rewrite(self, groups)
+                if replacement is None:
+                    continue
+                self.replace(self.window, replacement)
+                self.hits[rule.name] += 1
+                applied = True
+                break
+
+    # Replaces the lines of output from start on. Removing a label joins its region to the one
+    # before, which is counted again unless the new lines start another.
+    def replace(self, start, lines):
+        output = self.output
+        if start < self.region:
+            del output[start:]
+            self.region = start
+            if not any(line.endswith(':') for line in lines):
+                while self.region > 0 and not output[self.region - 1].endswith(':'):
+                    self.region -= 1
+            self.writes = Counter(written_name(line) for line in output[self.region:])
+        else:
+            for line in output[start:]:
+                self.writes[written_name(line)] -= 1
+            del output[start:]
+        for line in lines:
+            self.append(line)
+
+    # name holds a value at the start of the window: a line since the last label wrote it
+    def written(self, name):
+        within = sum(written_name(line) == name for line in self.output[max(self.window, self.region):])
+        return self.writes[name] > within
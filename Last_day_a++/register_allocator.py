@@ -0,0 +1,115 @@
+#register_allocator.py
+import heapq
+from bisect import insort
+from ir import Compute, Move
+from optimizer import TEMPORARY_PREFIX, declared_types, liveness, renamed
+
+# Operand text of the registers and memory slots, followed by their number. Identifiers cannot
+# contain %, so these never clash with a variable.
+REGISTER_PREFIX = '%r'
+SLOT_PREFIX = '%m'
+
+
+# Linear-scan register allocation over the instructions in program order. A temporary's live
+# interval runs from its first to its last appearance, stretched over the blocks it is live
+# across; any other variable's spans the whole program, since its final value is the program's
+# result. Intervals are taken by start; one finding no free register takes the register of the
+# active interval ending last if that ends after it, and the one left without is spilled.
+# Spilled intervals get memory slots, reused once they end. Every instruction takes memory
+# operands, so spilling adds no instructions.
+# Run it after the other passes: it replaces every variable with its location.
+class LinearScanAllocator:
+    def __init__(self, register_count=8):
+        self.register_count = register_count
+        # Location of every variable that is not a temporary, for AssemblyInterpreter.execute()
+        self.locations = {}
+        self.spilled = 0
+        self.slot_count = 0
+
+    def run(self, graph, symbol_table=None):
+        declared = declared_types(symbol_table)
+        temporary = lambda name: name.startswith(TEMPORARY_PREFIX) and name not in declared
+        start, end = {}, {}
+        # Variables whose location a variable may take over where it is first written, since the
+        # instruction reads them for the last time
+        hints = {}
+        bounds = []
+        position = 0
+        for block in graph.blocks:
+            first = position
+            for instruction in block.instructions:
+                dest = instruction.dest
+                if dest is not None and dest not in start:
+                    if isinstance(instruction, Compute):
+                        hints[dest] = [instruction.left, instruction.right] if instruction.commutative() else [instruction.left]
+                    elif isinstance(instruction, Move):
+                        hints[dest] = [instruction.source]
+                for name in (dest,) + instruction.operands():
+                    if isinstance(name, str):
+                        start.setdefault(name, position)
+                        end[name] = position
+                position += 1
+            bounds.append((block, first, max(first, position - 1)))
+        temporaries = {name for name in start if temporary(name)}
+        live_in, live_out = liveness(graph, temporaries)
+        for block, first, last in bounds:
+            for name in live_in[block]:
+                start[name] = min(start[name], first)
+            for name in live_out[block]:
+                end[name] = max(end[name], last)
+        for name in start:
+            if name not in temporaries:
+                start[name], end[name] = 0, position
+
+        location = {}
+        free = [f"{REGISTER_PREFIX}{number}" for number in reversed(range(self.register_count))]
+        # Variables holding a register, by end
+        active = []
+        spilled = set()
+        order = sorted(start, key=start.get)
+        for name in order:
+            begin = start[name]
+            while active and end[active[0]] < begin:
+                free.append(location[active.pop(0)])
+            hint = next((other for other in hints.get(name, ()) if other in location and end[other] == begin and other in active), None)
+            if hint is not None:
+                active.remove(hint)
+                location[name] = location[hint]
+            elif free:
+                location[name] = free.pop()
+            elif active and end[active[-1]] > end[name]:
+                victim = active.pop()
+                location[name] = location.pop(victim)
+                spilled.add(victim)
+            else:
+                spilled.add(name)
+                continue
+            insort(active, name, key=end.get)
+
+        free_slots = []
+        # (end, slot) of the spilled intervals holding a slot
+        taken = []
+        slot_count = 0
+        for name in order:
+            if name not in spilled:
+                continue
+            while taken and taken[0][0] < start[name]:
+                free_slots.append(heapq.heappop(taken)[1])
+            if free_slots:
+                slot = free_slots.pop()
+            else:
+                slot = f"{SLOT_PREFIX}{slot_count}"
+                slot_count += 1
+            location[name] = slot
+            heapq.heappush(taken, (end[name], slot))
+
+        lines = len(graph.lines())
+        for block in graph.blocks:
+            # A copy of a temporary into the location it already shares is dropped
+            block.instructions = [renamed(instruction, location) for instruction in block.instructions
+                                  if not (isinstance(instruction, Move) and instruction.source in temporaries
+                                          and location[instruction.dest] == location[instruction.source])]
+        self.locations = {name: location[name] for name in start if name not in temporaries}
+        self.spilled += len(spilled)
+        self.slot_count = max(self.slot_count, slot_count)
+        return lines - len(graph.lines())
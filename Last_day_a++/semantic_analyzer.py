@@ -1,146 +1,376 @@
-import re
+from ast_nodes import Block, Literal
+from diagnostics import Diagnostics, TooManyErrors
+from syntax_analyzer import Parser, parse_parallel
+from type_inference import NUMERIC_TYPES, TypeInference, assignable, operation_type
+
+ARITHMETIC_OPERATORS = ['+', '-', '*', '/', '%']
+# Tokens after which a - starts an operand instead of subtracting
+OPERAND_END_TOKENS = ['VARIABLE', 'LITERAL', 'CONSTANT', 'RPAREN']
+
+
 class SemanticAnalyzer:
-    def __init__(self, symbol_table, tokens):
+    # tree is the Program built by Parser.parse() and symbol_table the parser's SymbolTable.
+    # Without a tree the checks run over the tokens, resolving names by lexeme alone; without
+    # a symbol table either, the tokens are parsed here. checks are the Check objects to run,
+    # all of them in one pass.
+    def __init__(self, symbol_table, tokens, diagnostics=None, tree=None, checks=None):
         self.symbol_table = symbol_table
         self.tokens = tokens
-        self.errors = []
-        self.current_token_index = 0
+        self.tree = tree
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
+        self.checks = DEFAULT_CHECKS if checks is None else checks
+        self.types = None
+        # Walks over the tree or the tokens so far
+        self.passes = 0
+        # The checks handlers was last built for
+        self.handler_checks = None
+        self.handlers = None
+
+    @property
+    def errors(self):
+        return self.diagnostics.messages()
 
     def analyze(self):
-        while self.current_token_index < len(self.tokens):
-            token_type, lexeme, line_number, *data_type = self.tokens[self.current_token_index]
-            if token_type == 'ASSIGN':
-                self.check_assignment()
-            self.current_token_index += 1
-
-    def check_assignment(self):
-        variable_token = self.tokens[self.current_token_index - 1]
-        variable_name = variable_token[1]
-        variable_type = self.symbol_table[variable_name]['data_type']
-        value_token = self.tokens[self.current_token_index + 1]
-        value_type = self.get_value_type(value_token[1])
-
-        if variable_type != value_type:
-            self.errors.append(f"Semantic error: Type mismatch on line {variable_token[2]}: cannot assign {value_type} to {variable_type}")
-
-    def get_value_type(self, value):
-        if re.match(r'^-?\d+$', value):
-            return 'integer'
-        elif re.match(r'^-?\d+\.\d*$', value):
-            return 'decimal'
-        elif re.match(r'^".*"$', value):
-            return 'line'
-        elif value in ['true', 'false']:
-            return 'flag'
-        else:
-            return self.symbol_table.get(value, {}).get('data_type', 'unknown')
+        if self.tree is None and self.symbol_table is None:
+            parser = Parser(self.tokens)
+            self.tree = parser.parse()
+            self.symbol_table = parser.symbols
+        self.run(self.checks)
+
+    # Analysis stops early once the diagnostics sink is full
+    def run(self, checks):
+        try:
+            if self.tree is not None:
+                self.walk_tree(checks)
+            else:
+                self.walk_tokens(checks)
+        except TooManyErrors:
+            pass
+
+    # One pre-order walk calling each check's visit_<Node> methods on every node
+    def walk_tree(self, checks):
+        self.passes += 1
+        if self.types is None:
+            self.types = TypeInference(self.symbol_table)
+        handlers = self.tree_handlers(checks)
+        pending = [self.tree]
+        while pending:
+            node = pending.pop()
+            for handler in handlers.get(type(node).__name__, ()):
+                handler(self, node)
+            pending.extend(list(node.children())[::-1])
+
+    # The checks' visit_<Node> methods by node class name, kept for further walks with the same checks
+    def tree_handlers(self, checks):
+        if self.handler_checks is not checks:
+            handlers = {}
+            for check in checks:
+                for name in dir(check):
+                    if name.startswith('visit_'):
+                        handlers.setdefault(name[len('visit_'):], []).append(getattr(check, name))
+            self.handler_checks, self.handlers = checks, handlers
+        return self.handlers
 
+    # One walk calling each check's token() on the tokens of its token_types
+    def walk_tokens(self, checks):
+        self.passes += 1
+        handlers = {}
+        for check in checks:
+            for token_type in check.token_types:
+                handlers.setdefault(token_type, []).append(check.token)
+        tokens = self.tokens
+        for index, token in enumerate(tokens):
+            for handler in handlers.get(token[0], ()):
+                handler(self, tokens, index)
+
+    # Each runs one check in a pass of its own
     def check_variable_usage(self):
-        for token_type, lexeme, line_number, *data_type in self.tokens:
-            if token_type == 'VARIABLE' and lexeme not in self.symbol_table:
-                self.errors.append(f"Semantic error: Variable '{lexeme}' used without declaration at line {line_number}")
+        self.run([VariableUsageCheck()])
 
     def check_function_calls(self):
-        for token_type, lexeme, line_number, *data_type in self.tokens:
-            if token_type == 'FUNCTION' and lexeme not in self.symbol_table:
-                self.errors.append(f"Semantic error: Function '{lexeme}' called without definition at line {line_number}")
+        self.run([FunctionCallCheck()])
 
     def check_data_type(self):
-        for lexeme, info in self.symbol_table.items():
-            if info['token_type'] == 'VARIABLE' and info['data_type'] != None and info['value'] != None:
-                if info['data_type'] == 'integer':
-                    if isinstance(int(info['value']), int):
-                        continue
-                    else:
-                        self.errors.append(f"Semantic error: Variable '{lexeme}' is of type {info['data_type']} but not assigned correctly at line {info['line_number']}")
-                elif info['data_type'] == 'decimal':
-                    if isinstance(float(info['value']), float):
-                        continue
-                    else:
-                        self.errors.append(f"Semantic error: Variable '{lexeme}' is of type {info['data_type']} but not assigned correctly at line {info['line_number']}")
-                elif info['data_type'] == 'line':
-                    if isinstance(info['value'], str):
-                        continue
-                    else:
-                        self.errors.append(f"Semantic error: Variable '{lexeme}' is of type {info['data_type']} but not assigned correctly at line {info['line_number']}")
-                elif info['data_type'] == 'flag':
-                    if info['value'] in ['true', 'false']:
-                        continue
-                    else:
-                        self.errors.append(f"Semantic error: Variable '{lexeme}' is of type {info['data_type']} but not assigned correctly at line {info['line_number']}")
-
+        self.run([InitialValueCheck()])
 
     def check_type_compatibility(self):
-        operator_tokens = ['+', '-', '*', '/', '%']
-        for i, (token_type, lexeme, line_number, *data_type) in enumerate(self.tokens):
-            if token_type == 'OPERATOR' and lexeme in operator_tokens:
-                if i == 0 or i == len(self.tokens) - 1:
-                    self.errors.append(f"Semantic error: Operator '{lexeme}' requires two operands at line {line_number}")
-                    continue
-                    
-                previous_token = self.tokens[i - 1]
-                next_token = self.tokens[i + 1]
-                
-                # Initialize operands types
-                left_operand_type = None
-                right_operand_type = None
-                
-                # Check previous token type
-                if previous_token[0] == 'LITERAL':
-                    try:
-                        float(previous_token[1])  # Attempt to convert to float
-                        left_operand_type = 'decimal'
-                    except ValueError:
-                        try:
-                            int(previous_token[1])  # Attempt to convert to int
-                            left_operand_type = 'integer'
-                        except ValueError:
-                            left_operand_type = None
-                else:
-                    if previous_token[1] in self.symbol_table:
-                        left_operand_type = self.symbol_table[previous_token[1]]['data_type']
-                    else:
-                        left_operand_type = None
-                
-                # Check next token type
-                if next_token[0] == 'LITERAL':
-                    try:
-                        float(next_token[1])  # Attempt to convert to float
-                        right_operand_type = 'decimal'
-                    except ValueError:
-                        try:
-                            int(next_token[1])  # Attempt to convert to int
-                            right_operand_type = 'integer'
-                        except ValueError:
-                            right_operand_type = None
-                else:
-                    if next_token[1] in self.symbol_table:
-                        right_operand_type = self.symbol_table[next_token[1]]['data_type']
-                    else:
-                        right_operand_type = None
-                
-                # Check specific operations and their operand types
-                if lexeme in ['-', '/', '*', '%'] and (left_operand_type in ['line', 'flag'] or right_operand_type in ['line', 'flag']):
-                    self.errors.append(f"Semantic error: Cannot perform these operations on non-numeric types at line {line_number}")
-                    continue
-                
-                # Check for type mismatch
-                if left_operand_type != right_operand_type:
-                    self.errors.append(f"Semantic error: Type mismatch in expression at line {line_number}")
-                # Handle cases where type is not defined
-                if left_operand_type is None or right_operand_type is None:
-                    self.errors.append(f"Semantic error: Type not defined at line {line_number}")
-                    continue
-                
-                # Check if both operands are numeric
-                if left_operand_type in ['decimal', 'integer'] and right_operand_type in ['decimal', 'number']:
-                    continue
-                
-                elif left_operand_type in ['integer', 'integer'] and right_operand_type in ['integer', 'number']:
-                    continue                
-                
+        self.run([OperandTypeCheck()])
+
+    def get_value_type(self, node):
+        return self.types.infer(node)
+
+    # The type of a single token; names are looked up by lexeme
+    def get_token_type(self, token):
+        if token[0] in ['LITERAL', 'CONSTANT']:
+            return token[3]
+        if token[0] in ['VARIABLE', 'FUNCTION']:
+            symbol = self.symbol_table.get(token[1])
+            if symbol is not None:
+                return symbol.data_type
+        return 'unknown'
+
+
+# A pluggable semantic check. SemanticAnalyzer calls its visit_<Node>(analyzer, node) methods
+# while walking the tree, or token(analyzer, tokens, index) for each token of token_types while
+# walking the tokens when there is no tree.
+class Check:
+    token_types = ()
+
+    def token(self, analyzer, tokens, index):
+        pass
+
+
+# In token mode the value's type is taken from its leading operand. An undeclared variable or a
+# value of unknown type is left to the check that found what is wrong with it, such as
+# VariableUsageCheck or OperandTypeCheck.
+class AssignmentTypeCheck(Check):
+    token_types = ('ASSIGN',)
+
+    def visit_Declaration(self, analyzer, node):
+        if node.value is not None:
+            self.visit_Assignment(analyzer, node)
+
+    def visit_Assignment(self, analyzer, node):
+        symbol = analyzer.symbol_table.resolve(node)
+        value_type = analyzer.get_value_type(node.value)
+        self.check(analyzer, node.line, symbol.data_type if symbol else None, value_type)
+
+    def token(self, analyzer, tokens, index):
+        if index == 0 or tokens[index - 1][0] != 'VARIABLE':
+            return
+        name = tokens[index - 1]
+        if name[3] is not None:
+            line, variable_type = tokens[index - 2][2], name[3]
+        else:
+            symbol = analyzer.symbol_table.get(name[1])
+            line, variable_type = name[2], symbol.data_type if symbol else None
+        value = index + 1
+        while value < len(tokens) and tokens[value][0] == 'LPAREN':
+            value += 1
+        value_type = analyzer.get_token_type(tokens[value]) if value < len(tokens) else 'unknown'
+        self.check(analyzer, line, variable_type, value_type)
+
+    def check(self, analyzer, line, variable_type, value_type):
+        if variable_type is not None and value_type != 'unknown' and not assignable(variable_type, value_type):
+            analyzer.diagnostics.report('assignment-type-mismatch', line, value_type, variable_type)
+
+
+class VariableUsageCheck(Check):
+    token_types = ('VARIABLE',)
+
+    def visit_Variable(self, analyzer, node):
+        if analyzer.symbol_table.resolve(node) is None:
+            analyzer.diagnostics.report('undeclared-variable', node.line, node.name)
+
+    def visit_Assignment(self, analyzer, node):
+        self.visit_Variable(analyzer, node)
+
+    def token(self, analyzer, tokens, index):
+        token_type, lexeme, line_number, *data_type = tokens[index]
+        if lexeme not in analyzer.symbol_table:
+            analyzer.diagnostics.report('undeclared-variable', line_number, lexeme)
+
+
+class FunctionCallCheck(Check):
+    token_types = ('FUNCTION',)
+
+    def visit_Call(self, analyzer, node):
+        if analyzer.symbol_table.resolve(node) is None:
+            analyzer.diagnostics.report('undefined-function', node.line, node.name)
+
+    def token(self, analyzer, tokens, index):
+        token_type, lexeme, line_number, *data_type = tokens[index]
+        if lexeme not in analyzer.symbol_table:
+            analyzer.diagnostics.report('undefined-function', line_number, lexeme)
+
+
+# Declarations initialized with a single literal. AssignmentTypeCheck reports the same
+# declarations, so this one only runs on its own, through check_data_type().
+class InitialValueCheck(Check):
+    token_types = ('ASSIGN',)
+
+    def visit_Declaration(self, analyzer, node):
+        if isinstance(node.value, Literal):
+            self.check(analyzer, node.line, node.name, node.data_type, node.value.data_type)
+
+    def token(self, analyzer, tokens, index):
+        if not (2 <= index < len(tokens) - 2 and tokens[index - 1][0] == 'VARIABLE' and tokens[index - 1][3] is not None):
+            return
+        if tokens[index + 1][0] in ['LITERAL', 'CONSTANT'] and tokens[index + 2][0] == 'STATEMENT_END':
+            name = tokens[index - 1]
+            self.check(analyzer, tokens[index - 2][2], name[1], name[3], tokens[index + 1][3])
+
+    def check(self, analyzer, line, name, data_type, value_type):
+        if data_type == 'integer':
+            valid = value_type == 'integer'
+        elif data_type == 'decimal':
+            valid = value_type in NUMERIC_TYPES
+        elif data_type == 'line':
+            valid = value_type in ['line', 'single']
+        elif data_type == 'flag':
+            valid = value_type == 'flag'
+        else:
+            valid = True
+        if not valid:
+            analyzer.diagnostics.report('bad-initial-value', line, name, data_type)
+
+
+# Operators applied to operands of the wrong types. In token mode only arithmetic operators
+# are checked, on the tokens next to them.
+class OperandTypeCheck(Check):
+    token_types = ('OPERATOR',)
+
+    def visit_BinaryOp(self, analyzer, node):
+        analyzer.get_value_type(node)
+        record = analyzer.types.error(node)
+        if record is not None:
+            analyzer.diagnostics.add(record)
+
+    def visit_UnaryOp(self, analyzer, node):
+        self.visit_BinaryOp(analyzer, node)
+
+    def token(self, analyzer, tokens, index):
+        token_type, lexeme, line_number, *data_type = tokens[index]
+        if lexeme not in ARITHMETIC_OPERATORS:
+            return
+        if index == 0 or index == len(tokens) - 1:
+            analyzer.diagnostics.report('missing-operand', line_number, lexeme)
+        elif not (lexeme == '-' and tokens[index - 1][0] not in OPERAND_END_TOKENS):
+            self.check(analyzer, line_number, lexeme, analyzer.get_token_type(tokens[index - 1]), analyzer.get_token_type(tokens[index + 1]))
+
+    def check(self, analyzer, line, operator, left_type, right_type):
+        if left_type == 'unknown' or right_type == 'unknown':
+            analyzer.diagnostics.report('undefined-type', line)
+        elif operation_type(operator, left_type, right_type) is None:
+            analyzer.diagnostics.report('operand-types', line, operator, left_type, right_type)
+
+
+# Names a unit refers to without a symbol of its own: globals, symbols of other files and
+# undeclared names
+class UseCollector(Check):
+    def __init__(self):
+        self.names = set()
+
+    def visit_Variable(self, analyzer, node):
+        if node.symbol is None:
+            self.names.add(node.name)
+
+    def visit_Assignment(self, analyzer, node):
+        self.visit_Variable(analyzer, node)
+
+    def visit_Call(self, analyzer, node):
+        self.visit_Variable(analyzer, node)
+
+
+# What analyze() runs unless given other checks, all in one pass. Names no symbol declares are
+# reported, so a file using functions of other files needs a SymbolIndex linked.
+ALL_CHECKS = [AssignmentTypeCheck(), VariableUsageCheck(), FunctionCallCheck(), OperandTypeCheck()]
+DEFAULT_CHECKS = ALL_CHECKS
+
+
+# Parse on a process pool, then check the whole tree: checks need every global, which is only
+# known once all chunks are parsed. Syntax errors come before semantic errors, as when Parser
+# and SemanticAnalyzer run one after another.
+def analyze_parallel(tokens, workers=None, chunks_per_worker=4, diagnostics=None):
+    tree, symbols, Errors = parse_parallel(tokens, workers, chunks_per_worker, diagnostics)
+    SemanticAnalyzer(symbols, tokens, Errors, tree).analyze()
+    return tree, symbols, Errors
+
+
+# Keeps the semantic diagnostics of each top-level unit of an IncrementalParser, with the globals
+# the unit uses as edges of a def-use graph. After an edit only the reparsed units are checked
+# again, plus the units using a global whose declaration changed kind or type; every other unit
+# keeps its records, so the work done follows the size of the edit rather than of the program.
+class IncrementalAnalyzer:
+    def __init__(self, checks=None):
+        self.checks = DEFAULT_CHECKS if checks is None else checks
+        # id of each unit's node list, in the parser's order, and per id
+        # (nodes, line of the first node when checked, records, names used, globals declared)
+        self.unit_keys = []
+        self.units = {}
+        # Global name -> ids of the units using it, and the (kind, data type) they were checked with
+        self.users = {}
+        self.definitions = {}
+        self.error_count = 0
+        # Units checked by the last update()
+        self.checked = 0
+        # Set when the table's external symbols changed since the last update()
+        self.external_changed = False
+
+    def update(self, parser, diagnostics=None):
+        table = parser.symbols
+        changed = set()
+        # Positions of the units parsed since the last update, moved along by later edits
+        added = []
+        for first, old_count, new_count in parser.take_edits():
+            for key in self.unit_keys[first:first + old_count]:
+                if key is not None:
+                    changed.update(self.forget(key))
+            self.unit_keys[first:first + old_count] = [None] * new_count
+            added = [index if index < first else index + new_count - old_count for index in added if not first <= index < first + old_count]
+            added.extend(range(first, first + new_count))
+        for index in added:
+            self.unit_keys[index] = id(parser.unit_nodes[index])
+            changed.update(symbol.name for symbol in parser.unit_symbols[index] if symbol.depth == 0)
+        dirty = set()
+        for name in changed:
+            symbol = table.globals.get(name)
+            definition = (symbol.kind, symbol.data_type) if symbol else None
+            if definition != self.definitions.get(name):
+                dirty.update(self.users.get(name, ()))
+                if symbol:
+                    self.definitions[name] = definition
                 else:
-                    self.errors.append(f"Semantic error: Operands must be integer or float types for arithmetic operations at line {line_number}")
-                    continue
-                
+                    del self.definitions[name]
+        if self.external_changed:
+            for name, keys in self.users.items():
+                if name not in table.globals:
+                    dirty.update(keys)
+            self.external_changed = False
+        # One analyzer for every unit, so the checks' handlers are looked up once
+        uses = UseCollector()
+        analyzer = SemanticAnalyzer(table, None, None, None, self.checks + [uses])
+        for index in added:
+            self.check(analyzer, uses, parser.unit_nodes[index], [symbol.name for symbol in parser.unit_symbols[index] if symbol.depth == 0])
+        for key in dirty:
+            nodes, line, records, names, defines = self.units[key]
+            self.forget(key)
+            self.check(analyzer, uses, nodes, defines)
+        self.checked = len(added) + len(dirty)
+
+        errors = Diagnostics() if diagnostics is None else diagnostics
+        if self.error_count:
+            try:
+                for nodes in parser.unit_nodes:
+                    nodes, line, records, names, defines = self.units[id(nodes)]
+                    shift = nodes[0].line - line if records and line is not None else 0
+                    errors.extend([(code, record_line + shift if record_line is not None else None, args) for code, record_line, args in records] if shift else records)
+            except TooManyErrors:
+                pass
+        return errors
+
+    # Has the next update() check again every unit using a name the file does not declare, e.g.
+    # after the SymbolIndex linked to the table was updated
+    def invalidate_external(self):
+        self.external_changed = True
+
+    # Runs the checks on one unit, recording the names it uses as it goes
+    def check(self, analyzer, uses, nodes, defines):
+        analyzer.tree = Block(nodes)
+        analyzer.diagnostics = Diagnostics()
+        uses.names = set()
+        analyzer.analyze()
+        key = id(nodes)
+        records = analyzer.diagnostics.records
+        self.units[key] = (nodes, nodes[0].line if nodes else None, records, uses.names, defines)
+        self.error_count += len(records)
+        for name in uses.names:
+            self.users.setdefault(name, set()).add(key)
 
+    # Drops a unit's results and returns the globals it declared
+    def forget(self, key):
+        nodes, line, records, names, defines = self.units.pop(key)
+        self.error_count -= len(records)
+        for name in names:
+            self.users[name].discard(key)
+        return defines
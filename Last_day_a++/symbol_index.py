@@ -0,0 +1,151 @@
+#symbol_index.py
+import glob
+import hashlib
+import locale
+import os
+import sqlite3
+from ast_nodes import Declaration, FunctionDef
+from lexical_analyzer import LEXER_VERSION, tokenize_buffer
+from symbol_table import Symbol
+from syntax_analyzer import Parser
+
+# Bump whenever a change to the parser, the symbol table or the rows written changes what is
+# indexed for a file, so files indexed before are indexed again
+INDEX_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT NOT NULL, kind TEXT NOT NULL, data_type TEXT, path TEXT NOT NULL,
+    line INTEGER, slot INTEGER, signature TEXT NOT NULL, hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS symbols_by_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS symbols_by_path ON symbols (path);
+"""
+
+
+# A global of another file, as found in the index
+class ExternalSymbol(Symbol):
+    __slots__ = ('path', 'signature', 'hash')
+
+    def __init__(self, name, kind, data_type, line, slot, path, signature, hash):
+        super().__init__(name, kind, data_type, line, 0, slot)
+        self.path = path
+        self.signature = signature
+        self.hash = hash
+
+
+# Functions and globals of every file of a project in one SQLite file, so a compile can
+# resolve names from other files without lexing them. A file is re-indexed only when its
+# content hash changes. Files are decoded with encoding, by default the locale's, as for open()
+# in text mode.
+class SymbolIndex:
+    def __init__(self, filename, encoding=None):
+        self.encoding = locale.getpreferredencoding(False) if encoding is None else encoding
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(SCHEMA)
+        self.cache = {}
+        self.indexed = 0
+        self.skipped = 0
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def key(self, source):
+        digest = hashlib.sha256(f"lexer-{LEXER_VERSION} index-{INDEX_VERSION} {self.encoding}\n".encode())
+        digest.update(source)
+        return digest.hexdigest()
+
+    # Re-indexes the files whose content changed and returns their paths
+    def update(self, filenames):
+        changed = []
+        stored = dict(self.connection.execute("SELECT path, hash FROM files"))
+        for filename in filenames:
+            path = os.path.abspath(filename)
+            with open(filename, 'rb') as file:
+                source = file.read()
+            key = self.key(source)
+            if stored.get(path) == key:
+                self.skipped += 1
+                continue
+            self.index_source(path, source, key)
+            changed.append(path)
+        if changed:
+            self.connection.commit()
+            self.cache.clear()
+        return changed
+
+    def index_source(self, path, source, key):
+        tokens, _ = tokenize_buffer(source, None, self.encoding)
+        parser = Parser(tokens)
+        tree = parser.parse()
+        signatures = {}
+        for node in tree.body:
+            if isinstance(node, FunctionDef):
+                params = ', '.join(f"{param.data_type} {param.name}" for param in node.params if isinstance(param, Declaration))
+                signatures[node.symbol] = f"{node.return_type} {node.name}({params})"
+            elif isinstance(node, Declaration):
+                signatures[node.symbol] = f"{node.data_type} {node.name}"
+        rows = [(symbol.name, symbol.kind, symbol.data_type, path, symbol.line, symbol.slot, signatures.get(symbol, symbol.name), key)
+                for symbol in parser.symbols.globals.values()]
+        self.connection.execute("DELETE FROM symbols WHERE path = ?", (path,))
+        self.connection.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?)", (path, key))
+        self.indexed += 1
+
+    # update() for exactly filenames: files indexed before but no longer listed are removed.
+    # Returns the paths re-indexed or removed.
+    def sync(self, filenames):
+        changed = self.update(filenames)
+        listed = {os.path.abspath(filename) for filename in filenames}
+        for path in self.files():
+            if path not in listed:
+                self.remove(path)
+                changed.append(path)
+        return changed
+
+    def remove(self, filename):
+        path = os.path.abspath(filename)
+        self.connection.execute("DELETE FROM symbols WHERE path = ?", (path,))
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.connection.commit()
+        self.cache.clear()
+
+    # The definition of name, from the first file defining it by path; None if no file does
+    def lookup(self, name):
+        if name in self.cache:
+            return self.cache[name]
+        row = self.connection.execute(
+            "SELECT name, kind, data_type, line, slot, path, signature, hash FROM symbols WHERE name = ? ORDER BY path, line LIMIT 1",
+            (name,)).fetchone()
+        symbol = ExternalSymbol(*row) if row else None
+        self.cache[name] = symbol
+        return symbol
+
+    def files(self):
+        return dict(self.connection.execute("SELECT path, hash FROM files"))
+
+    def stats(self):
+        return {'indexed': self.indexed, 'skipped': self.skipped}
+
+
+# The A++ sources next to filename, other than filename itself
+def sibling_files(filename, pattern='*.txt'):
+    directory = os.path.dirname(os.path.abspath(filename))
+    path = os.path.abspath(filename)
+    return [name for name in sorted(glob.glob(os.path.join(directory, pattern))) if os.path.abspath(name) != path]
+
+# Lets symbol_table resolve the functions and globals of the other files of a project through a
+# persistent index; only the files changed since the last compile are lexed again, and files no
+# longer listed are dropped from the index
+def link_project(symbol_table, filenames, index_path, encoding=None):
+    index = SymbolIndex(index_path, encoding)
+    index.sync(filenames)
+    symbol_table.external = index
+    return index
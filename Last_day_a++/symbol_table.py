@@ -0,0 +1,120 @@
+#symbol_table.py
+
+# One declared name. depth is 0 for globals and one more for each enclosing block; slot is the
+# symbol's index in the frame of its function, or in the program's frame for globals.
+class Symbol:
+    __slots__ = ('name', 'kind', 'data_type', 'line', 'depth', 'slot', 'shadowed')
+
+    def __init__(self, name, kind, data_type, line, depth, slot=None, shadowed=None):
+        self.name = name
+        self.kind = kind
+        self.data_type = data_type
+        self.line = line
+        self.depth = depth
+        self.slot = slot
+        # The symbol of the same name this one hides until its block closes
+        self.shadowed = shadowed
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.kind!r}, {self.data_type!r}, line={self.line}, depth={self.depth}, slot={self.slot})"
+
+
+# Scopes of the blocks open while parsing, kept as one hash chain: visible maps each name to the
+# innermost symbol declared in an open block, which links to the one it shadows, so a lookup is
+# one dict access at any depth and close_scope() restores the outer symbols.
+# Globals go to their own table and references to them are resolved after parsing, so that
+# top-level units still parse independently of each other.
+class SymbolTable:
+    def __init__(self):
+        self.visible = {}
+        # (symbols declared in the block, whether the block starts a frame) per open block
+        self.scopes = []
+        self.frame_sizes = []
+        self.globals = {}
+        # Every symbol, in declaration order, and the last one declared with each name
+        self.symbols = []
+        self.latest = {}
+        # Resolves names no file-level symbol has, e.g. a SymbolIndex of the other files of a project
+        self.external = None
+
+    @property
+    def depth(self):
+        return len(self.scopes)
+
+    # A function body, or a block at the top level, starts a new frame of slots
+    def open_scope(self, function=False):
+        new_frame = function or not self.scopes
+        if new_frame:
+            self.frame_sizes.append(0)
+        self.scopes.append(([], new_frame))
+
+    def close_scope(self):
+        symbols, new_frame = self.scopes.pop()
+        for symbol in reversed(symbols):
+            if symbol.shadowed is None:
+                del self.visible[symbol.name]
+            else:
+                self.visible[symbol.name] = symbol.shadowed
+        if new_frame:
+            self.frame_sizes.pop()
+
+    def declare(self, name, kind, data_type, line):
+        if not self.scopes:
+            symbol = Symbol(name, kind, data_type, line, 0)
+            self.add([symbol])
+            return symbol
+        symbol = Symbol(name, kind, data_type, line, len(self.scopes), self.frame_sizes[-1], self.visible.get(name))
+        self.frame_sizes[-1] += 1
+        self.visible[name] = symbol
+        self.scopes[-1][0].append(symbol)
+        self.symbols.append(symbol)
+        self.latest[name] = symbol
+        return symbol
+
+    # Takes over the symbols of separately parsed units, in source order. A global declared
+    # again replaces the earlier one and keeps its slot.
+    def add(self, symbols):
+        for symbol in symbols:
+            self.symbols.append(symbol)
+            self.latest[symbol.name] = symbol
+            if symbol.depth == 0:
+                previous = self.globals.get(symbol.name)
+                symbol.slot = previous.slot if previous else len(self.globals)
+                self.globals[symbol.name] = symbol
+
+    # The innermost symbol of an open block; None means a global or an undeclared name
+    def lookup(self, name):
+        return self.visible.get(name)
+
+    # The symbol a Variable, Assignment, Declaration, Call or FunctionDef refers to
+    def resolve(self, node):
+        symbol = node.symbol or self.globals.get(node.name)
+        if symbol is None and self.external is not None:
+            symbol = self.external.lookup(node.name)
+        return symbol
+
+    def storage_name(self, node):
+        symbol = self.resolve(node)
+        return node.name if symbol is None else self.variable_name(symbol)
+
+    # Interpreter variable holding symbol's value. A local hiding another symbol of the same name
+    # gets its depth appended; identifiers cannot contain _, so this never clashes. Parameters keep
+    # their name, since CALL binds no arguments and the body reads the caller's variables.
+    def variable_name(self, symbol):
+        if symbol.depth == 0 or symbol.kind == 'PARAMETER' or symbol.shadowed is None and symbol.name not in self.globals:
+            return symbol.name
+        return f"{symbol.name}_{symbol.depth}"
+
+    # Lookup by name alone: the global, else the last local declared with that name, else the
+    # external symbol
+    def get(self, name):
+        symbol = self.globals.get(name) or self.latest.get(name)
+        if symbol is None and self.external is not None:
+            symbol = self.external.lookup(name)
+        return symbol
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __iter__(self):
+        return iter(self.symbols)
@@ -1,234 +1,623 @@
+import os
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, chain
+from ast_nodes import (Assignment, BinaryOp, Block, Call, Declaration, FunctionDef, Getinput, If, Literal,
+                       Otherwise, Program, Repeat, Resume, Rotate, Showout, Stop, Then, UnaryOp, Variable)
+from diagnostics import Diagnostics, TooManyErrors
+from lexical_analyzer import common_prefix, common_suffix
+from symbol_table import SymbolTable
+
+# Binding power of binary operators; prefix -, ++ and -- bind tighter than all of them
+BINARY_PRECEDENCE = {
+    '==': 1, '!=': 1, '<': 1, '>': 1, '<=': 1, '>=': 1,
+    '+': 2, '-': 2,
+    '*': 3, '/': 3, '%': 3,
+}
+COMPARISON_OPERATORS = ['==', '!=', '<', '>', '<=', '>=']
+PREFIX_OPERATORS = ['-', '++', '--']
+PREFIX_PRECEDENCE = 4
+POSTFIX_OPERATORS = ['++', '--']
+
+
+# Raised after a syntax error is reported; statement_list() recovers by skipping to the next ! or }
+class ParseError(Exception):
+    pass
+
+
+class FuelExhausted(Exception):
+    pass
+
+
 class Parser:
-    def __init__(self, tokens):
+    # fuel, when given, is the most tokens the parser may consume before giving up.
+    # start is the index of the first token to parse, which must begin a top-level unit.
+    def __init__(self, tokens, diagnostics=None, fuel=None, start=0):
         self.tokens = tokens
-        self.current_token_index = 0
-        self.current_token = self.tokens[self.current_token_index] if self.tokens else None
+        # Tokens are pulled one at a time so a lazy token stream can be parsed
+        self.token_stream = map(tokens.__getitem__, range(start, len(tokens))) if start else iter(tokens)
+        self.current_token_index = start
+        self.current_token = next(self.token_stream, None)
+        self.last_line = self.current_token[2] if self.current_token else None
         self.block_stack = []
-        self.errors = []
+        # Scopes are opened and closed along with block_stack
+        self.symbols = SymbolTable()
+        # The statement list whose last iff may still take otherwise/then branches
+        self.alternatives_target = None
+        self.tree = None
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
+        self.fuel = fuel
 
     def advance(self):
+        if self.current_token is None:
+            return
+        if self.fuel is not None:
+            if self.fuel == 0:
+                self.diagnostics.report('parser-fuel-exhausted', self.current_token[2], self.current_token_index)
+                raise FuelExhausted(self.current_token_index)
+            self.fuel -= 1
+        self.last_line = self.current_token[2]
         self.current_token_index += 1
-        if self.current_token_index < len(self.tokens):
-            self.current_token = self.tokens[self.current_token_index]
-        else:
-            self.current_token = None
+        self.current_token = next(self.token_stream, None)
 
     def match(self, expected_token_type):
-        if self.current_token and self.current_token[0] == expected_token_type or self.current_token == None:
+        if self.current_token and self.current_token[0] == expected_token_type:
             self.advance()
         else:
-            self.errors.append(f"Syntax error: Expected {expected_token_type}, found {self.current_token[0] if self.current_token else 'EOF'} at line {self.current_token[2]}")
+            self.error(expected_token_type)
+
+    def error(self, expected):
+        if self.current_token is None:
+            self.diagnostics.report('expected-token', self.last_line, expected, 'EOF')
+        else:
+            self.diagnostics.report('expected-token', self.current_token[2], expected, self.current_token[0])
+        raise ParseError(expected)
 
+    # Panic mode: skip to just past the next ! or to the next } closing an enclosing block.
+    # A { ... } group met on the way is skipped whole.
+    def synchronize(self):
+        depth = 0
+        while self.current_token:
+            token_type = self.current_token[0]
+            if token_type == 'RCURLY' and depth == 0:
+                return
+            self.advance()
+            if token_type == 'STATEMENT_END' and depth == 0:
+                return
+            elif token_type == 'LCURLY':
+                depth += 1
+            elif token_type == 'RCURLY':
+                depth -= 1
+                if depth == 0:
+                    return
+
+    @property
+    def errors(self):
+        return self.diagnostics.messages()
+
+    # Builds and returns the Program tree; parsing stops early once the diagnostics sink is full
     def parse(self):
-        self.program()
+        try:
+            self.tree = self.program()
+        except (TooManyErrors, FuelExhausted):
+            self.tree = Program([])
+        return self.tree
 
     def program(self):
-        self.statement_list()
+        return Program(self.statement_list())
 
+    # The whole program in one loop. block() only opens a block: its statements are appended to
+    # the innermost entry of block_stack until the matching } pops it, so nesting depth costs
+    # no recursion. Every pass consumes at least one token, so parsing is linear in the input.
     def statement_list(self):
+        statements = []
         while self.current_token:
-            self.statement()
-        if self.current_token == None and len(self.block_stack) > 0:
-            er = '}'
-            self.errors.append(f"Syntax error: Missing {er} of Block at line {self.block_stack[-1][1]}")
-            return
+            self.parse_unit(statements)
+        return statements
 
-    def statement(self):
-        if self.current_token[0] == 'LCURLY':
-            self.block()
-        elif self.current_token[0] == 'RCURLY':
+    # One top-level unit: a statement with the blocks it opens and the otherwise/then branches
+    # after it. Units end where block_stack is empty again, so each parses independently.
+    def parse_unit(self, statements):
+        self.alternatives_target = None
+        self.next_statement(statements)
+        while self.current_token and (self.block_stack or self.current_token[0] == 'KEYWORD' and self.current_token[1] in ['otherwise', 'then']):
+            self.next_statement(statements)
+        if self.current_token is None:
+            while self.block_stack:
+                self.diagnostics.report('missing-block-end', self.block_stack.pop()[1])
+                self.symbols.close_scope()
+
+    # Parses one statement, or one }, into the innermost open block
+    def next_statement(self, statements):
+        target = self.block_stack[-1][2].body if self.block_stack else statements
+        if self.current_token[0] == 'RCURLY':
+            self.advance()
             if self.block_stack:
                 self.block_stack.pop()
+                self.symbols.close_scope()
+                self.alternatives_target = self.block_stack[-1][2].body if self.block_stack else statements
+            else:
+                self.alternatives_target = None
+            return
+        start = self.current_token_index
+        try:
+            node = self.statement()
+        except ParseError:
+            self.synchronize()
+            node = None
+        if self.current_token_index == start and self.current_token and self.current_token[0] != 'RCURLY':
             self.advance()
+        if node is None:
+            self.alternatives_target = None
+            return
+        # otherwise/then branches belong to the iff statement right before them
+        if isinstance(node, (Otherwise, Then)) and self.alternatives_target is target and isinstance(target[-1], If):
+            target[-1].alternatives.append(node)
+        else:
+            target.append(node)
+        self.alternatives_target = target
+
+    def statement(self):
+        if self.current_token[0] == 'LCURLY':
+            return self.block()
         elif self.current_token[0] == 'DATA_TYPE':
-            self.declaration()
+            return self.declaration()
         elif self.current_token[0] == 'KEYWORD':
             if self.current_token[1] in ['iff', 'otherwise', 'then']:
-                self.conditional_statement()
+                return self.conditional_statement()
             elif self.current_token[1] in ['repeat', 'rotate']:
-                self.loop_statement()
+                return self.loop_statement()
             elif self.current_token[1] == 'Blank':
-                self.function_definition()
+                return self.function_definition()
             elif self.current_token[1] == 'resume' or self.current_token[1] == 'stop':
+                node = Resume(self.current_token[2]) if self.current_token[1] == 'resume' else Stop(self.current_token[2])
                 self.advance()
                 self.match('STATEMENT_END')
+                return node
             elif self.current_token[1] == 'showout':
-                self.print_statement()
+                return self.print_statement()
             elif self.current_token[1] == 'getinput':
-                self.input_statement()
+                return self.input_statement()
+            self.advance()
         elif self.current_token[0] == 'FUNCTION':
-            self.function_call()
+            node = self.function_call()
             self.match('STATEMENT_END')
+            return node
         elif self.current_token[0] == 'VARIABLE':
-            self.assignment()
-        elif self.current_token == None:
-            pass
+            return self.assignment()
         else:
             self.advance()
 
+    # Precedence climbing over explicit operand/operator stacks, so long expressions and deep
+    # parentheses take linear time and no Python recursion
     def expression(self):
-        if self.current_token[0] in ['LITERAL', 'CONSTANT', 'VARIABLE', 'OPERATOR']:
-            self.match(self.current_token[0])
-            return False
-        elif self.current_token[0] == 'FUNCTION':
-            self.function_call()
-            return True
+        operands = []
+        operators = []
+        open_parens = 0
+        while True:
+            # Prefix operators and ( before an operand
+            while self.current_token and (self.current_token[0] == 'LPAREN' or self.current_token[0] == 'OPERATOR' and self.current_token[1] in PREFIX_OPERATORS):
+                if self.current_token[0] == 'LPAREN':
+                    operators.append(('(', 0, self.current_token[2]))
+                    open_parens += 1
+                else:
+                    operators.append((self.current_token[1], PREFIX_PRECEDENCE, self.current_token[2]))
+                self.advance()
+            operands.append(self.operand())
+            # Postfix ++/-- and the ) closing a parenthesis opened inside this expression
+            while self.current_token:
+                if self.current_token[0] == 'OPERATOR' and self.current_token[1] in POSTFIX_OPERATORS:
+                    operands.append(UnaryOp(self.current_token[1], operands.pop(), True, self.current_token[2]))
+                elif self.current_token[0] == 'RPAREN' and open_parens:
+                    while operators[-1][0] != '(':
+                        self.reduce(operands, operators)
+                    operators.pop()
+                    open_parens -= 1
+                else:
+                    break
+                self.advance()
+            token = self.current_token
+            if not (token and token[0] == 'OPERATOR' and token[1] in BINARY_PRECEDENCE):
+                break
+            precedence = BINARY_PRECEDENCE[token[1]]
+            while operators and operators[-1][1] >= precedence:
+                self.reduce(operands, operators)
+            operators.append((token[1], precedence, token[2]))
+            self.advance()
+        while operators:
+            if operators[-1][0] == '(':
+                self.error('RPAREN')
+            self.reduce(operands, operators)
+        return operands[0]
+
+    # Replaces the top operator and its operands with one node
+    def reduce(self, operands, operators):
+        operator, precedence, line = operators.pop()
+        if precedence == PREFIX_PRECEDENCE:
+            operands.append(UnaryOp(operator, operands.pop(), False, line))
         else:
-            return True
+            right = operands.pop()
+            operands.append(BinaryOp(operator, operands.pop(), right, line))
+
+    def operand(self):
+        token = self.current_token
+        if token is None:
+            self.error('expression')
+        if token[0] in ['LITERAL', 'CONSTANT']:
+            self.advance()
+            return Literal(token[1], token[0], token[3], token[4], token[2])
+        elif token[0] == 'VARIABLE':
+            self.advance()
+            return Variable(token[1], token[2], self.symbols.lookup(token[1]))
+        elif token[0] == 'FUNCTION':
+            return self.function_call()
+        self.error('expression')
 
     def declaration(self):
+        if self.current_token is None:
+            self.error('DATA_TYPE')
+        data_type, line = self.current_token[1], self.current_token[2]
         self.match('DATA_TYPE')
-        if self.current_token[0] == 'FUNCTION':
-            self.function_definition()
+        if self.current_token and self.current_token[0] == 'FUNCTION':
+            return self.function_definition(data_type)
+        name = self.current_token[1] if self.current_token else None
+        self.match('VARIABLE')
+        value = None
+        if self.current_token == None:
+            self.diagnostics.report('missing-statement-end', None)
+        elif self.current_token[0] == 'STATEMENT_END':
+            self.match('STATEMENT_END')
         else:
-            self.match('VARIABLE')
-            if self.current_token == None:
-                self.errors.append('Syntax Error: Missing ! at the end.')
-            elif self.current_token[0] == 'STATEMENT_END':
-                self.match('STATEMENT_END')
-            else:
-                self.match('ASSIGN')
-                while self.current_token[0] != 'STATEMENT_END':
-                    if self.expression():
-                        break
-                self.match('STATEMENT_END')
+            self.match('ASSIGN')
+            value = self.expression()
+            self.match('STATEMENT_END')
+        # Declared after its value, which still sees any outer symbol of the same name
+        return Declaration(data_type, name, value, line, self.symbols.declare(name, 'VARIABLE', data_type, line))
 
     def assignment(self):
+        name, line = self.current_token[1], self.current_token[2]
         self.match('VARIABLE')
         self.match('ASSIGN')
-        while self.current_token[0] != 'STATEMENT_END':
-            if self.expression():
-                break
+        value = self.expression()
         self.match('STATEMENT_END')
+        return Assignment(name, value, line, self.symbols.lookup(name))
 
+    # Comparisons are parsed by expression(); a condition without one is still reported
     def condition(self):
-        self.expression()
-        self.match('OPERATOR')
-        self.expression()
+        node = self.expression()
+        if not (isinstance(node, BinaryOp) and node.operator in COMPARISON_OPERATORS):
+            self.match('OPERATOR')
+        return node
 
     def conditional_statement(self):
-        if self.current_token[1] == 'iff':
-            self.match('KEYWORD')
-            self.condition()
-            self.block()
-        elif self.current_token[1] == 'otherwise':
-            self.match('KEYWORD')
-            self.condition()
-            self.block()
-        elif self.current_token[1] == 'then':
-            self.match('KEYWORD')
-            self.block()
+        keyword, line = self.current_token[1], self.current_token[2]
+        self.match('KEYWORD')
+        if keyword == 'iff':
+            condition = self.condition()
+            return If(condition, self.block(), line=line)
+        elif keyword == 'otherwise':
+            condition = self.condition()
+            return Otherwise(condition, self.block(), line)
+        else:
+            return Then(self.block(), line)
 
+    # The step of a repeat loop, i++, --i or any other expression
     def loop_progression(self):
-        if self.current_token[0] == 'VARIABLE':
-            self.match('VARIABLE')
-            self.match('OPERATOR')
-            if self.current_token[0] == 'VARIABLE':
-                self.match('VARIABLE')
-        elif self.current_token[0] == 'OPERATOR':
-            self.match('OPERATOR')
-            if self.current_token[0] == 'LITERAL':
-                self.match('LITERAL')
-            elif self.current_token[0] == 'VARIABLE':
-                self.match('VARIABLE')
-        else:
-            pass
+        if self.current_token is None or self.current_token[0] == 'RPAREN':
+            return None
+        return self.expression()
 
     def loop_statement(self):
-        if self.current_token[1] == 'repeat':
-            self.match('KEYWORD')
-            self.match('LPAREN')
-            self.declaration()
-            self.condition()
+        keyword, line = self.current_token[1], self.current_token[2]
+        self.match('KEYWORD')
+        self.match('LPAREN')
+        if keyword == 'repeat':
+            init = self.declaration()
+            condition = self.condition()
             self.match('STATEMENT_END')
-            self.loop_progression()
+            step = self.loop_progression()
             self.match('RPAREN')
-            self.block()
-            self.match('RCURLY')  # Ensure closing of block
-        elif self.current_token[1] == 'rotate':
-            self.match('KEYWORD')
-            self.match('LPAREN')
-            self.condition()
+            return Repeat(init, condition, step, self.block(), line)
+        else:
+            condition = self.condition()
             self.match('RPAREN')
-            self.block()
-            self.match('RCURLY')  # Ensure closing of block
+            return Rotate(condition, self.block(), line)
 
+    # Call arguments, or DATA_TYPE VARIABLE parameters of a function definition
     def argument_list(self):
+        items = []
         while self.current_token and self.current_token[0] != 'RPAREN':
             if self.current_token[0] == 'DATA_TYPE':
-                self.match(self.current_token[0])
-                if self.current_token[0] == 'VARIABLE':
-                    self.match('VARIABLE')
-                    if self.current_token[0] != 'RPAREN':
-                        self.match('SEPERATOR')
+                data_type, line = self.current_token[1], self.current_token[2]
+                self.advance()
+                if self.current_token and self.current_token[0] == 'VARIABLE':
+                    items.append(Declaration(data_type, self.current_token[1], None, line))
+                    self.advance()
+                elif self.current_token:
+                    self.diagnostics.report('expected-variable', self.current_token[2], self.current_token[1])
+                    raise ParseError('VARIABLE')
                 else:
-                    self.errors.append(f"Syntax error: Expected VARIABLE, found {self.current_token[1]} at line {self.current_token[2]}")
-            elif self.current_token[0] == 'VARIABLE':
-                self.match(self.current_token[0])
-            elif self.current_token[0] == 'LITERAL':
-                self.match(self.current_token[0])
-                if self.current_token[0] != 'RPAREN':
-                    self.match('SEPERATOR')
+                    self.error('VARIABLE')
+            elif self.current_token[0] in ['VARIABLE', 'LITERAL', 'CONSTANT', 'FUNCTION', 'LPAREN'] or self.current_token[0] == 'OPERATOR' and self.current_token[1] in PREFIX_OPERATORS:
+                items.append(self.expression())
             else:
-                self.advance()
-
-        if self.current_token and self.current_token[0] == 'RPAREN':
-            self.match('RPAREN')
-        else:
-            self.errors.append(f"Syntax error: Expected RPAREN ")
+                self.error('expression')
+            if self.current_token and self.current_token[0] != 'RPAREN':
+                self.match('SEPERATOR')
+        self.match('RPAREN')
+        return items
 
     def function_call(self):
+        name, line = self.current_token[1], self.current_token[2]
         self.match('FUNCTION')
         self.match('LPAREN')
-        if self.current_token[0] != 'RPAREN':
-            self.argument_list()
+        args = []
+        if self.current_token and self.current_token[0] != 'RPAREN':
+            args = self.argument_list()
         else:
             self.match('RPAREN')
+        return Call(name, args, line, self.symbols.lookup(name))
 
-    def function_definition(self):
+    def function_definition(self, return_type=None):
+        line = self.current_token[2]
         if self.current_token[1] == 'Blank':
+            return_type = 'Blank'
             self.match('KEYWORD')
-        
+        name = self.current_token[1] if self.current_token else None
         self.match('FUNCTION')
         self.match('LPAREN')
+        params = []
         if self.current_token and self.current_token[0] == 'RPAREN':
             self.match('RPAREN')
         else:
-            if self.current_token[0] != 'RPAREN':
-                self.argument_list()
-        self.block()
-        self.match('RCURLY')
-
-    def block(self):
-        if self.current_token == None:
-            return
-        self.block_stack.append(('BLOCK', self.current_token[2]))
+            params = self.argument_list()
+        # The function is declared in the enclosing scope and its parameters in the body's
+        symbol = self.symbols.declare(name, 'FUNCTION', return_type, line)
+        body = self.block(True)
+        for param in params:
+            if isinstance(param, Declaration):
+                param.symbol = self.symbols.declare(param.name, 'PARAMETER', param.data_type, param.line)
+        return FunctionDef(return_type, name, params, body, line, symbol)
 
+    # Opens a block, and its scope; a function body starts a new frame of slots
+    def block(self, function=False):
+        line = self.current_token[2] if self.current_token else self.last_line
         self.match('LCURLY')
-        self.statement_list()
+        block = Block([], line)
+        self.block_stack.append(('BLOCK', line, block))
+        self.symbols.open_scope(function)
+        return block
 
+    # showout takes comma separated expressions
     def print_statement(self):
+        line = self.current_token[2]
         self.match('KEYWORD')
-        while self.current_token[0] != 'STATEMENT_END':
-            if self.current_token[0] == 'STRING':
-                self.match('STRING')
-            elif self.current_token[0] == 'VARIABLE':
-                self.match('VARIABLE')
-            elif self.current_token[0] == 'SEPERATOR':
-                self.match('SEPERATOR')
-            else:
-                pass
+        args = []
+        if self.current_token and self.current_token[0] != 'STATEMENT_END':
+            args.append(self.expression())
+            while self.current_token and self.current_token[0] == 'SEPERATOR':
+                self.advance()
+                args.append(self.expression())
         self.match('STATEMENT_END')
+        return Showout(args, line)
 
+    # getinput takes comma separated variables; a string among them is a prompt and is skipped
     def input_statement(self):
+        line = self.current_token[2]
         self.match('KEYWORD')
-        while self.current_token[0] != 'STATEMENT_END':
-            if self.current_token[0] == 'STRING':
-                self.match('STRING')
-            elif self.current_token[0] == 'VARIABLE':
-                self.match('VARIABLE')
-            elif self.current_token[0] == 'SEPERATOR':
+        args = []
+        while self.current_token and self.current_token[0] != 'STATEMENT_END':
+            if self.current_token[0] == 'VARIABLE':
+                args.append(Variable(self.current_token[1], self.current_token[2], self.symbols.lookup(self.current_token[1])))
+            elif self.current_token[0] != 'CONSTANT':
+                self.error('VARIABLE')
+            self.advance()
+            if self.current_token and self.current_token[0] != 'STATEMENT_END':
                 self.match('SEPERATOR')
-            else:
-                pass
         self.match('STATEMENT_END')
+        return Getinput(args, line)
+
+
+# Token indexes just past the } closing each top-level function body, found by brace matching
+# alone. The parser's brace nesting always agrees with it, so a top-level unit ends at each of
+# these unless an otherwise/then follows.
+def function_ends(tokens):
+    ends = []
+    depth = 0
+    in_function = False
+    for index, token in enumerate(tokens):
+        if token[0] == 'LCURLY':
+            depth += 1
+        elif token[0] == 'RCURLY' and depth:
+            depth -= 1
+            if depth == 0 and in_function:
+                in_function = False
+                next_token = tokens[index + 1] if index + 1 < len(tokens) else None
+                if not (next_token and next_token[0] == 'KEYWORD' and next_token[1] in ['otherwise', 'then']):
+                    ends.append(index + 1)
+        # A FUNCTION token after a DATA_TYPE or Blank starts a definition
+        elif depth == 0 and token[0] == 'FUNCTION' and token[3] is not None:
+            in_function = True
+    return ends
+
+# Splits tokens into about count (start, end) spans cut only at function ends
+def function_chunks(tokens, count):
+    spans = []
+    size = len(tokens) // count + 1
+    start = 0
+    for end in function_ends(tokens):
+        if end - start >= size:
+            spans.append((start, end))
+            start = end
+    if start < len(tokens) or not spans:
+        spans.append((start, len(tokens)))
+    return spans
+
+def parse_chunk(tokens):
+    parser = Parser(tokens)
+    parser.parse()
+    return parser.tree.body, parser.diagnostics.records, parser.symbols.symbols
+
+# Parse function-aligned chunks on a process pool. Returns the tree, symbol table and errors that
+# Parser(tokens).parse() would give.
+def parse_parallel(tokens, workers=None, chunks_per_worker=4, diagnostics=None):
+    workers = workers or os.cpu_count() or 1
+    Errors = Diagnostics() if diagnostics is None else diagnostics
+    if workers == 1:
+        parser = Parser(tokens, Errors)
+        return parser.parse(), parser.symbols, Errors
+    spans = function_chunks(tokens, workers * chunks_per_worker)
+    body = []
+    symbols = SymbolTable()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for chunk_body, chunk_errors, chunk_symbols in executor.map(parse_chunk, [tokens[start:end] for start, end in spans]):
+                body.extend(chunk_body)
+                symbols.add(chunk_symbols)
+                Errors.extend(chunk_errors)
+        except TooManyErrors:
+            body = []
+            symbols = SymbolTable()
+    return Program(body), symbols, Errors
+
+
+# Keeps the tree split into top-level units and after an edit reparses only the units whose
+# tokens changed, reusing the subtrees of the units before and after them
+class IncrementalParser:
+    def __init__(self):
+        self.tokens = None
+        self.token_count = 0
+        self.unit_lengths = []
+        self.unit_nodes = []
+        self.unit_errors = []
+        self.unit_symbols = []
+        self.error_count = 0
+        self.tree = Program([])
+        self.symbols = SymbolTable()
+        # (first unit, units replaced, units parsed in their place) per reparse since take_edits()
+        self.edits = []
+
+    # edit is IncrementalLexer.take_edit(). Without it the tokens are compared with a copy of the
+    # last ones; the copy is kept only then, since the lexer's edit may already cover those changes.
+    def update(self, tokens, diagnostics=None, edit=None):
+        keep_copy = edit is None
+        if keep_copy or self.tokens is not None:
+            edit = self.find_edit(tokens)
+        self.tokens = list(tokens) if keep_copy else None
+        prefix, suffix, shift = edit
+        delta = len(tokens) - self.token_count
+        self.token_count = len(tokens)
+        if prefix < len(tokens) or delta:
+            self.reparse(tokens, prefix, min(suffix, len(tokens) - prefix), delta, shift)
+        errors = Diagnostics() if diagnostics is None else diagnostics
+        if self.error_count:
+            try:
+                errors.extend(chain.from_iterable(self.unit_errors))
+            except TooManyErrors:
+                pass
+        return self.tree, errors
+
+    def find_edit(self, tokens):
+        old_tokens = self.tokens
+        if old_tokens is None:
+            return (0, 0, 0)
+        limit = min(len(old_tokens), len(tokens))
+        prefix = common_prefix(old_tokens, tokens, limit)
+        # Tokens after an edit that added or removed lines only differ by a line shift
+        shift = tokens[-1][2] - old_tokens[-1][2] if old_tokens and tokens else 0
+        if not shift:
+            return (prefix, common_suffix(old_tokens, tokens, limit - prefix), 0)
+        suffix = 0
+        while suffix < limit - prefix and self.same_token(old_tokens[-suffix - 1], tokens[-suffix - 1], shift):
+            suffix += 1
+        return (prefix, suffix, shift)
+
+    @staticmethod
+    def same_token(old_token, token, shift):
+        return old_token[2] + shift == token[2] and old_token[:2] == token[:2] and old_token[3:] == token[3:]
+
+    def reparse(self, tokens, prefix, suffix, delta, shift):
+        starts = list(accumulate(self.unit_lengths, initial=0))
+        # First unit whose tokens or lookahead token reach the edit
+        first = bisect_left(starts, prefix, 1) - 1
+        reusable_from = len(tokens) - suffix
+        parser = Parser(tokens, start=starts[first])
+        lengths, nodes, errors, symbols = [], [], [], []
+        old_index = first
+        while parser.current_token:
+            unit_start = parser.current_token_index
+            parser.diagnostics = Diagnostics()
+            parser.symbols.symbols = []
+            unit_nodes = []
+            parser.parse_unit(unit_nodes)
+            lengths.append(parser.current_token_index - unit_start)
+            nodes.append(unit_nodes)
+            errors.append(parser.diagnostics.records)
+            symbols.append(parser.symbols.symbols)
+            position = parser.current_token_index
+            if position < reusable_from:
+                continue
+            # Past the edit: stop at the first boundary an old unit also started at
+            while old_index < len(self.unit_lengths) and starts[old_index] < position - delta:
+                old_index += 1
+            if old_index < len(self.unit_lengths) and starts[old_index] == position - delta:
+                break
+        else:
+            old_index = len(self.unit_lengths)
+        if shift:
+            self.renumber(old_index, shift)
+        self.error_count += sum(map(len, errors)) - sum(map(len, self.unit_errors[first:old_index]))
+        # The tree's statements are spliced in place, like IncrementalLexer.tokens
+        node_start = sum(map(len, self.unit_nodes[:first]))
+        node_end = node_start + sum(map(len, self.unit_nodes[first:old_index]))
+        self.tree.body[node_start:node_end] = chain.from_iterable(nodes)
+        self.unit_lengths[first:old_index] = lengths
+        self.unit_nodes[first:old_index] = nodes
+        self.unit_errors[first:old_index] = errors
+        self.replace_symbols(first, old_index, symbols)
+        self.edits.append((first, old_index - first, len(nodes)))
+
+    # The unit edits since the last call, for IncrementalAnalyzer.update()
+    def take_edits(self):
+        edits = self.edits
+        self.edits = []
+        return edits
+
+    # When the reparsed units declare the same names at the same levels, as after most edits,
+    # globals keep their slots and each new symbol takes the place of the old one. Otherwise the
+    # slots of later globals may move and the table is rebuilt from every unit.
+    def replace_symbols(self, first, old_index, symbols):
+        old_symbols = list(chain.from_iterable(self.unit_symbols[first:old_index]))
+        new_symbols = list(chain.from_iterable(symbols))
+        symbol_start = sum(map(len, self.unit_symbols[:first]))
+        self.unit_symbols[first:old_index] = symbols
+        if [(symbol.name, symbol.depth == 0) for symbol in old_symbols] != [(symbol.name, symbol.depth == 0) for symbol in new_symbols]:
+            external = self.symbols.external
+            self.symbols = SymbolTable()
+            self.symbols.external = external
+            self.symbols.add(chain.from_iterable(self.unit_symbols))
+            return
+        table = self.symbols
+        for old_symbol, symbol in zip(old_symbols, new_symbols):
+            if symbol.depth == 0:
+                symbol.slot = old_symbol.slot
+                if table.globals[symbol.name] is old_symbol:
+                    table.globals[symbol.name] = symbol
+            if table.latest[symbol.name] is old_symbol:
+                table.latest[symbol.name] = symbol
+        table.symbols[symbol_start:symbol_start + len(old_symbols)] = new_symbols
+
+    # Reused units below an edit that added or removed lines move to new line numbers
+    def renumber(self, first_unit, shift):
+        pending = list(chain.from_iterable(self.unit_nodes[first_unit:]))
+        while pending:
+            node = pending.pop()
+            if node.line is not None:
+                node.line += shift
+            pending.extend(node.children())
+        for symbol in chain.from_iterable(self.unit_symbols[first_unit:]):
+            symbol.line += shift
+        if self.error_count:
+            for index in range(first_unit, len(self.unit_errors)):
+                if self.unit_errors[index]:
+                    self.unit_errors[index] = [(code, line + shift if line is not None else None, args) for code, line, args in self.unit_errors[index]]
@@ -0,0 +1,104 @@
+#token_cache.py
+import hashlib
+import locale
+import marshal
+import os
+from diagnostics import Diagnostics, TooManyErrors
+from lexical_analyzer import LEXER_VERSION, tokenize_buffer
+
+# On-disk token streams keyed by a hash of the source bytes, their encoding and the lexer version
+class TokenCache:
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self.entries())
+
+    def key(self, source, encoding='utf-8'):
+        digest = hashlib.sha256(f"lexer-{LEXER_VERSION} {encoding}\n".encode())
+        digest.update(source)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.tok')
+
+    def entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tok'):
+                stat = entry.stat()
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def load(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                tokens, records = marshal.load(file)
+        except FileNotFoundError:
+            return None
+        except (EOFError, ValueError, TypeError):
+            self.remove(path)
+            return None
+        # Touch the entry so eviction drops the least recently used files first
+        os.utime(path)
+        return tokens, records
+
+    # Errors are kept as diagnostic records, so cached entries carry no formatted text
+    def store(self, key, tokens, records):
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as file:
+            marshal.dump((tokens, records), file)
+        if os.path.exists(path):
+            self.total_bytes -= os.path.getsize(path)
+        os.replace(temp_path, path)
+        self.total_bytes += os.path.getsize(path)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.total_bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        for path, size, _ in sorted(self.entries(), key=lambda entry: entry[2]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.remove(path)
+
+    def tokenize_bytes(self, source, diagnostics=None, encoding='utf-8'):
+        errors = Diagnostics() if diagnostics is None else diagnostics
+        key = self.key(source, encoding)
+        cached = self.load(key)
+        if cached is not None:
+            self.hits += 1
+            tokens, records = cached
+        else:
+            self.misses += 1
+            # Lex into a private sink so a max_errors cutoff on the caller's sink never truncates the entry
+            tokens, lexed = tokenize_buffer(source, None, encoding)
+            records = lexed.records
+            self.store(key, tokens, records)
+        try:
+            errors.extend(records)
+        except TooManyErrors:
+            pass
+        return tokens, errors
+
+    def tokenize(self, code, diagnostics=None):
+        return self.tokenize_bytes(code.encode(), diagnostics)
+
+    # encoding defaults to the locale's, as for open() in text mode
+    def tokenize_file(self, filename, diagnostics=None, encoding=None):
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        with open(filename, 'rb') as file:
+            return self.tokenize_bytes(file.read(), diagnostics, encoding)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': self.total_bytes}
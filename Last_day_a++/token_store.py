@@ -0,0 +1,126 @@
+#token_store.py
+from array import array
+from diagnostics import Diagnostics, TooManyErrors
+from lexical_analyzer import token_types, tokenize_line
+
+# Small integer codes for token types and data types
+TOKEN_TYPES = [token for token in token_types if token not in ('Identifier', 'COMMENT')] + ['FUNCTION', 'VARIABLE']
+DATA_TYPES = [None, 'integer', 'decimal', 'line', 'flag', 'single', 'Blank']
+TOKEN_TYPE_CODES = {token: code for code, token in enumerate(TOKEN_TYPES)}
+DATA_TYPE_CODES = {data_type: code for code, data_type in enumerate(DATA_TYPES)}
+# Identifier tokens carry a data type field and literal tokens a data type and value; every
+# other token is (type, lexeme, line)
+TYPED_CODES = {TOKEN_TYPE_CODES['FUNCTION'], TOKEN_TYPE_CODES['VARIABLE']}
+LITERAL_CODES = {TOKEN_TYPE_CODES['LITERAL'], TOKEN_TYPE_CODES['CONSTANT']}
+
+
+class Token(tuple):
+    # Lightweight view handed out by TokenStore; indexes and unpacks exactly like the lexer's tuples
+    __slots__ = ()
+
+    @property
+    def type(self):
+        return self[0]
+
+    @property
+    def lexeme(self):
+        return self[1]
+
+    @property
+    def line(self):
+        return self[2]
+
+    @property
+    def data_type(self):
+        return self[3] if len(self) > 3 else None
+
+    @property
+    def value(self):
+        return self[4] if len(self) > 4 else None
+
+
+class TokenStore:
+    # Columnar token storage: one byte per type and data type, one int per line and lexeme id.
+    # A literal's value depends on its lexeme only, so it is kept once per lexeme in values.
+    def __init__(self, tokens=()):
+        self.types = array('B')
+        self.data_types = array('B')
+        self.lines = array('I')
+        self.lexemes = array('I')
+        self.strings = []
+        self.string_ids = {}
+        self.values = []
+        self.extend(tokens)
+
+    def intern(self, lexeme, value=None):
+        string_id = self.string_ids.get(lexeme)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.string_ids[lexeme] = string_id
+            self.strings.append(lexeme)
+            self.values.append(value)
+        return string_id
+
+    def append(self, token):
+        token_type, lexeme, line_number, *data_type = token
+        self.types.append(TOKEN_TYPE_CODES[token_type])
+        self.data_types.append(DATA_TYPE_CODES[data_type[0] if data_type else None])
+        self.lines.append(line_number)
+        self.lexemes.append(self.intern(lexeme, data_type[1] if len(data_type) > 1 else None))
+
+    def extend(self, tokens):
+        for token in tokens:
+            self.append(token)
+
+    def __len__(self):
+        return len(self.types)
+
+    def token_at(self, index):
+        type_code = self.types[index]
+        if type_code in TYPED_CODES:
+            return Token((TOKEN_TYPES[type_code], self.strings[self.lexemes[index]], self.lines[index], DATA_TYPES[self.data_types[index]]))
+        if type_code in LITERAL_CODES:
+            lexeme_id = self.lexemes[index]
+            return Token((TOKEN_TYPES[type_code], self.strings[lexeme_id], self.lines[index], DATA_TYPES[self.data_types[index]], self.values[lexeme_id]))
+        return Token((TOKEN_TYPES[type_code], self.strings[self.lexemes[index]], self.lines[index]))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.token_at(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('token index out of range')
+        return self.token_at(index)
+
+    def __iter__(self):
+        strings = self.strings
+        values = self.values
+        for type_code, lexeme_id, line_number, data_type_code in zip(self.types, self.lexemes, self.lines, self.data_types):
+            if type_code in TYPED_CODES:
+                yield Token((TOKEN_TYPES[type_code], strings[lexeme_id], line_number, DATA_TYPES[data_type_code]))
+            elif type_code in LITERAL_CODES:
+                yield Token((TOKEN_TYPES[type_code], strings[lexeme_id], line_number, DATA_TYPES[data_type_code], values[lexeme_id]))
+            else:
+                yield Token((TOKEN_TYPES[type_code], strings[lexeme_id], line_number))
+
+    def nbytes(self):
+        arrays = (self.types, self.data_types, self.lines, self.lexemes)
+        return sum(column.itemsize * len(column) for column in arrays)
+
+# Tokenize straight into a TokenStore without building the tuple list first
+def tokenize_compact(code, diagnostics=None):
+    Errors = Diagnostics() if diagnostics is None else diagnostics
+    store = TokenStore()
+    prev_token = None
+    try:
+        for line_number, line in enumerate(code.split('\n'), start=1):
+            line_tokens, line_errors = tokenize_line(line, line_number, prev_token)
+            if line_tokens:
+                store.extend(line_tokens)
+                prev_token = line_tokens[-1]
+            if line_errors:
+                Errors.extend(line_errors)
+    except TooManyErrors:
+        pass
+    return store, Errors
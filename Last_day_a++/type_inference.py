@@ -0,0 +1,87 @@
+#type_inference.py
+from ast_nodes import BinaryOp, Call, Literal, UnaryOp, Variable
+
+NUMERIC_TYPES = ['integer', 'decimal']
+COMPARISON_OPERATORS = ['==', '!=', '<', '>', '<=', '>=']
+
+# Type of operator applied to operands of the given types, or None if it does not apply.
+# integer mixed with decimal gives decimal, + also joins lines, and comparisons give flags.
+def operation_type(operator, left_type, right_type):
+    if left_type in NUMERIC_TYPES and right_type in NUMERIC_TYPES:
+        if operator in COMPARISON_OPERATORS:
+            return 'flag'
+        return 'decimal' if 'decimal' in (left_type, right_type) else 'integer'
+    elif operator == '+' and left_type == right_type == 'line':
+        return 'line'
+    elif operator in ['==', '!='] and left_type == right_type:
+        return 'flag'
+    elif operator in COMPARISON_OPERATORS and left_type == right_type == 'line':
+        return 'flag'
+    return None
+
+# A value of value_type can be stored in a variable of variable_type
+def assignable(variable_type, value_type):
+    if variable_type == value_type:
+        return True
+    return variable_type == 'decimal' and value_type == 'integer' or variable_type == 'line' and value_type == 'single'
+
+
+# Types every expression node once. Types are memoized by node, so typing an expression and
+# then each of its subexpressions, as a tree walk does, is linear in its size. A node whose
+# operands do not fit its operator gets an error record and type 'unknown'; nodes above it
+# take 'unknown' silently, so each mistake is reported once, where it is.
+class TypeInference:
+    def __init__(self, symbol_table):
+        self.symbol_table = symbol_table
+        self.types = {}
+        self.errors = {}
+
+    # Computed bottom-up on an explicit stack, so deep expressions need no recursion
+    def infer(self, node):
+        node_type = self.types.get(node)
+        if node_type is not None:
+            return node_type
+        pending = [(node, False)]
+        while pending:
+            node, operands_done = pending.pop()
+            if node in self.types:
+                continue
+            operands = self.operands(node)
+            if operands_done or not operands:
+                self.types[node] = self.node_type(node)
+            else:
+                pending.append((node, True))
+                pending.extend((operand, False) for operand in operands if operand not in self.types)
+        return self.types[node]
+
+    # Error record for node, once infer() has reached it
+    def error(self, node):
+        return self.errors.get(node)
+
+    def operands(self, node):
+        if isinstance(node, BinaryOp):
+            return (node.left, node.right)
+        elif isinstance(node, UnaryOp):
+            return (node.operand,)
+        return ()
+
+    def node_type(self, node):
+        if isinstance(node, Literal):
+            return node.data_type
+        elif isinstance(node, Variable) or isinstance(node, Call):
+            symbol = self.symbol_table.resolve(node)
+            return symbol.data_type if symbol else 'unknown'
+        elif isinstance(node, UnaryOp):
+            operand_type = self.types[node.operand]
+            if operand_type == 'unknown' or operand_type in NUMERIC_TYPES:
+                return operand_type
+            self.errors[node] = ('unary-operand-type', node.line, (node.operator, operand_type))
+        elif isinstance(node, BinaryOp):
+            left_type, right_type = self.types[node.left], self.types[node.right]
+            if left_type == 'unknown' or right_type == 'unknown':
+                return 'unknown'
+            node_type = operation_type(node.operator, left_type, right_type)
+            if node_type is not None:
+                return node_type
+            self.errors[node] = ('operand-types', node.line, (node.operator, left_type, right_type))
+        return 'unknown'